@@ -8,15 +8,39 @@ from kivymd.uix.label import MDLabel
 from kivymd.uix.card import MDCard
 from kivymd.uix.dialog import MDDialog
 from kivymd.uix.filemanager import MDFileManager
+from kivymd.uix.spinner import MDSpinner
 from kivy.core.window import Window
+from kivy.graphics.texture import Texture
+from kivy.uix.image import Image as KivyImage
+from kivy.metrics import dp
 from kivy.utils import platform
 from kivy.clock import Clock
 
 import os
+import sys
 import shutil
+import threading
+
+# Shared modules live in the repo-level 'core' package. The APK build copies it
+# next to this file; when running from a checkout, fall back to the parent dir.
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if not os.path.isdir(os.path.join(APP_DIR, "core")):
+    sys.path.append(os.path.dirname(APP_DIR))
+
 from remover_mobile import MobileRemover
+from core.encoder import save_image as encode_image
 from PIL import Image
 
+# Optional cap on the output's longest side, e.g. 4096 for low-memory phones:
+# larger JPEGs are then decoded at reduced scale (faster, but a smaller cutout).
+# None keeps the photo's full resolution; the model input is downscaled either way.
+MAX_IMAGE_SIDE = None
+# Re-estimate alpha along the outline (core.matting): cleaner hair and fur,
+# but it adds seconds per photo on most phones, so it is opt-in
+REFINE_EDGES = False
+# Target inference time per photo; slower devices get a lighter model
+LATENCY_BUDGET_MS = 1500
+
 class MainScreen(MDScreen):
     pass
 
@@ -53,8 +77,20 @@ class BGRemoverApp(MDApp):
         )
         self.image_display.add_widget(MDLabel(text="Tap + to Upload", halign="center", theme_text_color="Custom", text_color=(1,1,1,1)))
         self.image_card.add_widget(self.image_display)
+        # Result preview: a plain Kivy Image, which renders an assigned texture.
+        # (MDSmartTile's inner image is a layout in KivyMD 1.x, so it would not.)
+        self.result_view = KivyImage(size_hint=(1, 1), allow_stretch=True, keep_ratio=True)
         
         self.content.add_widget(self.image_card)
+
+        # Busy indicator (spins while the model loads / runs)
+        self.spinner = MDSpinner(
+            size_hint=(None, None),
+            size=(dp(36), dp(36)),
+            pos_hint={'center_x': 0.5},
+            active=False
+        )
+        self.content.add_widget(self.spinner)
         
         # Status Label
         self.status_label = MDLabel(
@@ -95,7 +131,8 @@ class BGRemoverApp(MDApp):
         )
         
         # Init AI
-        self.remover = None # Lazy load
+        self.remover = None # Lazy load (on the worker thread)
+        self.busy = False
         
         return layout
 
@@ -114,29 +151,75 @@ class BGRemoverApp(MDApp):
 
     def select_path(self, path):
         self.exit_manager()
-        self.status_label.text = "Processing..."
+        if self.busy:
+            return
+
+        self._show_widget(self.image_display)
         self.image_display.source = path
-        
-        # Run AI
-        if not self.remover:
-            self.remover = MobileRemover()
-            
+        self.set_busy(True, "Processing...")
+
+        # Model loading and inference block for seconds, run them off the UI thread
+        preview_size = tuple(int(v) for v in Window.size)
+        threading.Thread(target=self._process_worker, args=(path, preview_size), daemon=True).start()
+
+    def set_busy(self, busy, message=None):
+        self.busy = busy
+        self.spinner.active = busy
+        self.fab.disabled = busy
+        if busy:
+            self.btn_save.disabled = True
+        if message:
+            self.status_label.text = message
+
+    def _post_status(self, message):
+        # Widgets may only be touched from the main thread
+        Clock.schedule_once(lambda dt: setattr(self.status_label, 'text', message))
+
+    def _download_progress(self, done, total):
+        if total:
+            self._post_status(f"Downloading AI model... {done * 100 // total}%")
+        else:
+            self._post_status(f"Downloading AI model... {done // (1 << 20)} MB")
+
+    def _show_widget(self, widget):
+        # The card shows either the picked photo (tile) or the result (result_view)
+        if widget.parent is None:
+            self.image_card.clear_widgets()
+            self.image_card.add_widget(widget)
+
+    def _process_worker(self, path, preview_size):
         try:
-            # Process
-            output = self.remover.process_image(path)
-            self.current_result = output
-            
-            # Save temp preview
-            temp_path = "temp_result.png"
-            output.save(temp_path)
-            self.image_display.source = temp_path
-            self.image_display.reload()
-            
-            self.status_label.text = "Background Removed!"
-            self.btn_save.disabled = False
-            
+            if not self.remover:
+                self._post_status("Loading AI model...")
+                self.remover = MobileRemover(progress=self._download_progress,
+                                             latency_budget_ms=LATENCY_BUDGET_MS)
+
+            self._post_status("Removing background...")
+            output = self.remover.process_image(path, max_side=MAX_IMAGE_SIDE, refine_edges=REFINE_EDGES)
+
+            # Screen-sized RGBA preview, prepared here so the UI thread only uploads it
+            preview = output.copy()
+            preview.thumbnail(preview_size, Image.Resampling.BILINEAR)
+            preview_bytes = preview.tobytes()
         except Exception as e:
-            self.status_label.text = f"Error: {str(e)}"
+            message = f"Error: {str(e)}"
+            Clock.schedule_once(lambda dt: self.set_busy(False, message))
+            return
+
+        Clock.schedule_once(lambda dt: self._on_processed(output, preview.size, preview_bytes))
+
+    def _on_processed(self, output, preview_size, preview_bytes):
+        self.current_result = output
+
+        # Show the in-memory result directly, no PNG encode/decode round trip
+        texture = Texture.create(size=preview_size, colorfmt='rgba')
+        texture.blit_buffer(preview_bytes, colorfmt='rgba', bufferfmt='ubyte')
+        texture.flip_vertical() # PIL rows run top-down, GL bottom-up
+        self.result_view.texture = texture
+        self._show_widget(self.result_view)
+
+        self.set_busy(False, "Background Removed!")
+        self.btn_save.disabled = False
 
     def exit_manager(self, *args):
         self.file_manager.close()
@@ -148,11 +231,31 @@ class BGRemoverApp(MDApp):
             download_dir = os.path.join(dir, 'Download')
             filename = f"nobg_{int(Clock.get_time())}.png"
             save_path = os.path.join(download_dir, filename)
-            self.current_result.save(save_path)
-            self.status_label.text = f"Saved to Downloads/{filename}"
+            display_name = f"Downloads/{filename}"
         else:
-            self.current_result.save("output_mobile.png")
-            self.status_label.text = "Saved to output_mobile.png"
+            save_path = "output_mobile.png"
+            display_name = save_path
+
+        # Encoding a full-size PNG takes seconds on a phone, keep it off the UI thread
+        self.btn_save.disabled = True
+        self.status_label.text = "Saving..."
+        threading.Thread(
+            target=self._save_worker,
+            args=(self.current_result, save_path, display_name),
+            daemon=True
+        ).start()
+
+    def _save_worker(self, image, save_path, display_name):
+        try:
+            encode_image(image, save_path, preset="fast")
+            message = f"Saved to {display_name}"
+        except Exception as e:
+            message = f"Save failed: {str(e)}"
+        Clock.schedule_once(lambda dt: self._on_saved(message))
+
+    def _on_saved(self, message):
+        self.status_label.text = message
+        self.btn_save.disabled = False
 
     def show_info(self):
         d = MDDialog(title="About", text="AI Background Remover\n\nDeveloped by Faseeh Ansari\nPowered by U2-Net")
@@ -1,87 +1,82 @@
-import onnxruntime as ort
-import numpy as np
 from PIL import Image
 import os
-import requests
 
-# URL for the U2Net ONNX model (Standard)
-MODEL_URL = "https://github.com/danielgatis/rembg/releases/download/v0.0.0/u2net.onnx"
-MODEL_NAME = "u2net.onnx"
+from core.engine import Engine, upright
+from core.matting import refine_band
+from core.models import BenchmarkStore, get_spec, select_model
+
+# U2Net (Standard) unless a latency budget asks for something lighter
+DEFAULT_MODEL = "u2net"
+# Models small enough to ship to phones, lightest first
+MOBILE_MODELS = ("u2netp", "silueta", "u2net")
+# Measured inference latencies, used to pick a model for a latency budget
+BENCHMARKS_FILE = "benchmarks.json"
 
 class MobileRemover:
-    def __init__(self):
-        self.session = None
-        self._ensure_model()
+    def __init__(self, model_name=DEFAULT_MODEL, model_dir=".", progress=None, threads=None,
+                 latency_budget_ms=None, prefer_quality=True, model_url=None, checksum=None,
+                 model_path=None):
+        """
+        model_name: entry in core.models.MODELS (or a ModelSpec); ignored when
+            latency_budget_ms is set.
+        model_dir: where models (and the thread/latency caches) are kept.
+        progress: optional callable(done_bytes, total_bytes) while the model downloads.
+        threads: fixed intra-op thread count; by default it is calibrated once per device.
+        latency_budget_ms: pick the best model / input size that fits this budget,
+            using latencies measured on this device.
+        model_url / checksum / model_path: download the model from another URL
+            (e.g. a local HTTP stand-in server), verify it against another
+            'algo:hex' digest, or keep it in another file.
+        """
+        self.benchmarks = BenchmarkStore(os.path.join(model_dir, BENCHMARKS_FILE))
+        if latency_budget_ms:
+            spec, input_size = select_model(latency_budget_ms, prefer_quality,
+                                            candidates=MOBILE_MODELS, store=self.benchmarks)
+        else:
+            spec = get_spec(model_name) if isinstance(model_name, str) else model_name
+            input_size = None
+        if model_url or checksum or model_path:
+            spec = spec.with_source(model_url, checksum, model_path)
+
+        # Phones range from 4 to 8+ cores with big.LITTLE layouts, so thread
+        # counts are timed once per device and cached rather than guessed
+        self.engine = Engine.load(spec, model_dir, input_size=input_size, threads=threads,
+                                  calibrate=True, progress=progress, benchmarks=self.benchmarks)
 
-    def _ensure_model(self):
-        """Check if model exists, else download it."""
-        if not os.path.exists(MODEL_NAME):
-            print("Downloading model...")
-            response = requests.get(MODEL_URL)
-            with open(MODEL_NAME, "wb") as f:
-                f.write(response.content)
-            print("Model downloaded.")
-        
-        # Initialize session
-        # On Android, we might need to restrict threads
-        sess_options = ort.SessionOptions()
-        sess_options.intra_op_num_threads = 2
-        self.session = ort.InferenceSession(MODEL_NAME, sess_options, providers=['CPUExecutionProvider'])
+    def load_image(self, img_path, max_side=None):
+        """
+        Decodes img_path once, upright and in RGB.
+        max_side caps the decoded size; for JPEGs this is done with draft(),
+        so the decoder itself works at reduced scale and never materialises
+        the full-resolution frame.
+        """
+        img = Image.open(img_path)
+        if max_side and img.format == "JPEG" and max(img.size) > max_side:
+            scale = max_side / max(img.size)
+            img.draft("RGB", (int(img.width * scale), int(img.height * scale)))
 
-    def process_image(self, img_path):
+        img = upright(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if max_side and max(img.size) > max_side:
+            img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        return img
+
+    def process_image(self, img_path, max_side=None, refine_edges=False):
         """
-        Run inference directly using ONNX Runtime.
+        Run inference directly using ONNX Runtime (via the shared core engine).
         This bypasses 'rembg' library to avoid Scipy/NDK issues.
+        The file is decoded once; the same pixels feed the model and the output.
+        max_side: optional cap on the output size (see load_image); None keeps
+        the full resolution, only the model input is downscaled.
+        refine_edges: re-estimate alpha along the outline only (core.matting),
+        cheap enough for phones unlike full-image matting.
         """
-        # 1. Preprocess
-        img = Image.open(img_path).convert("RGB")
-        original_size = img.size
-        
-        # Resize to 320x320 (U2Net standard input)
-        img_resized = img.resize((320, 320), Image.Resampling.BILINEAR)
-        
-        # Normalize
-        img_np = np.array(img_resized).astype(np.float32)
-        img_np /= 255.0
-        
-        # Mean subtraction (standard ImageNet means) - actually U2Net uses specific mean?
-        # rembg implementation uses: (x - mean) / std
-        # But simple normalization 0-1 works "okay" for u2net generally, 
-        # let's try to match rembg preprocessing exactly if possible.
-        # rembg: mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]
-        
-        img_np -= np.array([0.485, 0.456, 0.406], dtype=np.float32)
-        img_np /= np.array([0.229, 0.224, 0.225], dtype=np.float32)
-        
-        # CHW format
-        img_np = img_np.transpose((2, 0, 1))
-        img_np = np.expand_dims(img_np, axis=0) # Batch dim
-        
-        # 2. Inference
-        input_name = self.session.get_inputs()[0].name
-        output_name = self.session.get_outputs()[0].name
-        
-        masks = self.session.run([output_name], {input_name: img_np})
-        mask = masks[0][0] # First batch, first channel
-        
-        # 3. Postprocess Mask
-        # Sigmoid
-        def sigmoid(x):
-            return 1 / (1 + np.exp(-x))
-            
-        mask = sigmoid(mask)
-        
-        # Squeeze
-        mask = np.squeeze(mask)
-        
-        # Convert to PIL
-        mask_img = Image.fromarray((mask * 255).astype(np.uint8), mode='L')
-        
-        # Resize mask back to original size
-        mask_img = mask_img.resize(original_size, Image.Resampling.LANCZOS)
-        
-        # 4. Composite
-        final_img = Image.open(img_path).convert("RGBA")
-        final_img.putalpha(mask_img)
-        
-        return final_img
+        img = self.load_image(img_path, max_side)
+        mask_img = self.engine.mask(img)
+        if refine_edges:
+            return refine_band(img, mask_img)
+
+        # putalpha turns the decoded RGB image into RGBA, no re-decode
+        img.putalpha(mask_img)
+        return img
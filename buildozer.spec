@@ -10,7 +10,7 @@ version = 1.0.0
 
 # Dependencies
 # Cleanest minimal set for KivyMD + ONNX
-requirements = python3,kivy,kivymd,pillow,numpy,onnxruntime,requests
+requirements = python3,kivy,kivymd==1.2.0,pillow,numpy,onnxruntime
 
 # Orientation
 orientation = portrait
@@ -0,0 +1,177 @@
+"""
+Memory-bounded admission of images into the pipeline.
+
+A 50MP photo costs several hundred MB while it is being processed (decoded
+frame, RGBA cutout, mask, matting buffers, composites, encoder copy), so a
+few large files arriving at once can push a worker out of memory. Jobs are
+sized from the image header alone, before anything is decoded, and admitted
+against a MemoryBudget: a job that does not fit waits until others finish,
+and a job that could never fit is downscaled to the largest size that does.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from PIL import Image
+
+from core.metrics import REGISTRY, resident_memory_bytes
+
+log = logging.getLogger(__name__)
+
+# Rough bytes per pixel of each stage, from the buffers it allocates
+DECODE_BPP = 4          # decoded RGB(A) frame
+CUTOUT_BPP = 4 + 1      # RGBA result and the 'L' mask
+ENCODE_BPP = 4          # encoder's copy while writing
+BAND_MATTING_BPP = 8    # core.matting: RGB + alpha copies, tiles are small
+FULL_MATTING_BPP = 400  # pymatting: float64 image, sparse Laplacian, ML foreground levels
+POST_PROCESS_BPP = 2    # rembg's morphological clean-up of the mask
+COMPOSITE_BPP = 12 + 3  # core.composite: uint16 premultiplied fg and inverse alpha, + output
+
+WAIT_SECONDS = REGISTRY.histogram("bgremover_admission_wait_seconds", "Time jobs waited for memory.")
+RESERVED_BYTES = REGISTRY.gauge("bgremover_admission_reserved_bytes", "Estimated memory of admitted jobs.")
+DOWNSCALED = REGISTRY.counter("bgremover_admission_downscaled_total",
+                              "Images downscaled to fit the memory budget.")
+
+
+def estimate_job_bytes(width, height, alpha_matting=False, matting_mode="full", post_process=False,
+                       backgrounds=0):
+    """Estimated peak memory of removing the background of one width x height image."""
+    bpp = DECODE_BPP + CUTOUT_BPP + ENCODE_BPP
+    if alpha_matting:
+        bpp += BAND_MATTING_BPP if matting_mode == "band" else FULL_MATTING_BPP
+    if post_process:
+        bpp += POST_PROCESS_BPP
+    if backgrounds:
+        bpp += COMPOSITE_BPP + ENCODE_BPP * (backgrounds - 1)
+    return width * height * bpp
+
+
+class MemoryBudget:
+    """
+    Admits jobs while the process stays under limit_bytes of resident memory.
+
+    The footprint of the process and its worker processes (interpreter,
+    model sessions) is measured whenever no job is running, and jobs are
+    admitted while that baseline plus the estimates of the running jobs
+    stays under the limit. Call rebaseline() once the models are loaded.
+    While jobs run the baseline stays fixed: their transient memory is what
+    the estimates stand for, not a lasting footprint. One job is always
+    admitted when nothing else runs, so a single oversized image never
+    blocks forever.
+    """
+    def __init__(self, limit_bytes, downscale=True, min_side=512):
+        """
+        downscale: shrink images whose estimate alone exceeds the budget
+            (otherwise they run on their own, over budget).
+        min_side: never downscale the longest side below this.
+        """
+        self.limit_bytes = limit_bytes
+        self.downscale = downscale
+        self.min_side = min_side
+        self._cond = threading.Condition()
+        self._reserved = 0
+        self._running = 0
+        self._worker_pids = ()
+        self._baseline = resident_memory_bytes()
+
+    def rebaseline(self, worker_pids=None):
+        """
+        Re-measures the footprint, e.g. after loading a model; only while no job runs.
+
+        worker_pids: worker processes (ProcessRemover.worker_pids) whose memory
+            counts from now on.
+        """
+        if worker_pids is not None:
+            self._worker_pids = tuple(worker_pids)
+        self._measure_idle()
+
+    def _measure_idle(self):
+        # Measured outside the lock: reading RSS takes syscalls, workers should not queue behind them
+        footprint = resident_memory_bytes(self._worker_pids)
+        with self._cond:
+            if not self._running:
+                self._baseline = footprint
+
+    @property
+    def available(self):
+        """Bytes a new job may use right now."""
+        with self._cond:
+            return self.limit_bytes - self._baseline - self._reserved
+
+    def scale_for(self, width, height, **flags):
+        """Factor (<= 1) the image must be scaled by for its job to fit the budget."""
+        if not self.downscale:
+            return 1.0
+        room = self.limit_bytes - self._baseline
+        needed = estimate_job_bytes(width, height, **flags)
+        if needed <= room:
+            return 1.0
+        # Memory grows with the pixel count, so scale the sides by the square root
+        scale = (max(room, 0) / needed) ** 0.5
+        return min(1.0, max(scale, self.min_side / max(width, height)))
+
+    @contextmanager
+    def admit(self, nbytes):
+        """Holds nbytes of the budget for the duration of the block, waiting if needed."""
+        start = time.perf_counter()
+        with self._cond:
+            while self._running and self._baseline + self._reserved + nbytes > self.limit_bytes:
+                self._cond.wait()
+            self._running += 1
+            self._reserved += nbytes
+            RESERVED_BYTES.set(self._reserved)
+        WAIT_SECONDS.observe(time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._reserved -= nbytes
+                idle = not self._running
+                RESERVED_BYTES.set(self._reserved)
+                self._cond.notify_all()
+            if idle:
+                # Re-measure what the process itself holds
+                self._measure_idle()
+
+
+@contextmanager
+def admitted_image(path, budget=None, **flags):
+    """
+    Opens path once it fits in budget and yields the decoded image, downscaled
+    first if its job could never fit. Without a budget this is a plain open.
+
+    flags: alpha_matting, matting_mode, post_process, backgrounds
+        (see estimate_job_bytes).
+    """
+    with Image.open(path) as img:
+        # Only the header has been read so far
+        width, height = img.size
+        if budget is None:
+            img.load()
+            yield img
+            return
+
+        scale = budget.scale_for(width, height, **flags)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        with budget.admit(estimate_job_bytes(size[0], size[1], **flags)):
+            if scale < 1.0:
+                DOWNSCALED.inc()
+                log.warning("%s: %dx%d does not fit the memory budget, processing at %dx%d",
+                            path, width, height, *size)
+                # JPEGs decode straight at reduced scale
+                img.draft("RGB", size)
+                yield img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+            else:
+                img.load()
+                yield img
+
+
+def parse_size(text):
+    """'2G', '512M', '1.5GB', '1048576' -> bytes."""
+    text = text.strip().upper().rstrip("B")
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
@@ -0,0 +1,237 @@
+"""
+Resumable batch mode.
+
+Removes the background from every image under the given files / folders,
+recording progress in a JobManifest next to the outputs. Re-running the
+same command after a crash or reboot skips everything already written.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from core.admission import admitted_image
+from core.composite import Compositor
+from core.encoder import EncoderPool
+from core.engine import upright
+from core.jobs import JobManifest
+from core.watcher import FILES, IMAGE_EXTENSIONS, QUEUE_DEPTH
+
+log = logging.getLogger(__name__)
+
+MANIFEST_NAME = "jobs.sqlite"
+
+# Progress is logged every this many seconds
+LOG_INTERVAL = 10.0
+
+
+class BatchRunner:
+    # "mode" label of the file / queue metrics
+    metrics_mode = "batch"
+
+    def __init__(self, inputs, output_dir, manifest_path=None, model_name="isnet-general-use",
+                 alpha_matting=True, post_process=True, workers=2, recursive=False,
+                 output_format="png", preset="balanced", latency_budget_ms=1000,
+                 matting_mode="full", backgrounds=None, retry_failed=False,
+                 memory_budget=None, processes=0, fast_paths=False):
+        self.inputs = [os.path.abspath(p) for p in inputs]
+        self.output_dir = os.path.abspath(output_dir)
+        self.manifest_path = manifest_path or os.path.join(self.output_dir, MANIFEST_NAME)
+        self.model_name = model_name
+        self.alpha_matting = alpha_matting
+        self.post_process = post_process
+        self.workers = workers
+        self.recursive = recursive
+        self.output_ext = "." + output_format.lower()
+        self.preset = preset
+        self.latency_budget_ms = latency_budget_ms
+        self.matting_mode = matting_mode
+        # Skip the model for transparent / flat-backdrop images (core.fastpath)
+        self.fast_paths = fast_paths
+        self.backgrounds = backgrounds or []
+        self.retry_failed = retry_failed
+        # core.admission.MemoryBudget shared by the workers, None for no limit
+        self.memory_budget = memory_budget
+        # Removal runs in this many processes (core.procpool), 0 for in-process
+        self.processes = processes
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._finished = 0  # Done or failed in this run
+        self._remover = None
+        self._encoder = None
+        self._manifest = None
+
+    def output_paths(self, path, root=None):
+        """Output files for path; folder inputs keep their sub-folder layout."""
+        out_dir = self.output_dir
+        if root is not None:
+            out_dir = os.path.join(out_dir, os.path.relpath(os.path.dirname(path), root))
+        base = os.path.splitext(os.path.basename(path))[0]
+        if not self.backgrounds:
+            return [os.path.join(out_dir, f"{base}_nobg{self.output_ext}")]
+        return [os.path.join(out_dir, f"{base}_bg{i + 1}{self.output_ext}")
+                for i in range(len(self.backgrounds))]
+
+    def collect(self):
+        """(input, outputs, size, mtime) for every image under the inputs."""
+        found = []
+
+        def add(path, root=None):
+            st = os.stat(path)
+            found.append((path, self.output_paths(path, root), st.st_size, st.st_mtime))
+
+        for item in self.inputs:
+            if os.path.isfile(item):
+                add(item)
+                continue
+            for dirpath, dirnames, filenames in os.walk(item):
+                # Never feed our own results back in
+                dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != self.output_dir]
+                for name in filenames:
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                        add(os.path.join(dirpath, name), item)
+                if not self.recursive:
+                    break
+        return found
+
+    def job_flags(self):
+        """Settings that drive the per-image memory estimate."""
+        return {
+            "alpha_matting": self.alpha_matting,
+            "matting_mode": self.matting_mode,
+            "post_process": self.post_process,
+            "backgrounds": len(self.backgrounds),
+        }
+
+    def _open_remover(self):
+        from core.remover import BgRemover, resolve_model
+
+        model_name, input_size = resolve_model(self.model_name, self.latency_budget_ms)
+        if self.processes:
+            from core.procpool import ProcessRemover
+            self._remover = ProcessRemover(model_name, self.processes, input_size=input_size)
+        else:
+            self._remover = BgRemover(model_name, input_size=input_size)
+        if self.memory_budget is not None:
+            # The budget's baseline was taken before the model was loaded
+            self.memory_budget.rebaseline(getattr(self._remover, "worker_pids", ()))
+
+    def _close_remover(self):
+        if hasattr(self._remover, "close"):
+            self._remover.close()
+        self._remover = None
+
+    def _process(self, path, outputs):
+        start = time.perf_counter()
+        try:
+            with admitted_image(path, self.memory_budget, **self.job_flags()) as img:
+                # Orient once: the remover and the compositor then share the same copy
+                img = upright(img)
+                result = self._remover.process_image(
+                    img, alpha_matting=self.alpha_matting, post_process=self.post_process,
+                    matting_mode=self.matting_mode, fast_paths=self.fast_paths
+                )
+                if self.backgrounds:
+                    compositor = Compositor(result, original=img)
+                    images = [compositor.composite_image(bg) for bg in self.backgrounds]
+                else:
+                    images = [result]
+        except Exception as e:
+            log.error("Failed to process %s: %s", path, e)
+            with self._lock:
+                self._finished += 1
+            FILES.labels(mode=self.metrics_mode, status="failed").inc()
+            self._manifest.mark_failed(path, e, (time.perf_counter() - start) * 1000)
+            return
+
+        remaining = [len(outputs)]
+        for out_path, image in zip(outputs, images):
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            future = self._encoder.submit(image, out_path)
+            future.add_done_callback(lambda f: self._on_written(path, start, f, remaining))
+
+    def _on_written(self, path, start, future, remaining):
+        with self._lock:
+            if remaining[0] == 0:
+                return  # Already recorded as failed
+            error = future.exception()
+            remaining[0] = 0 if error else remaining[0] - 1
+            if remaining[0]:
+                return
+            self._finished += 1
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if error:
+            log.error("Failed to write %s: %s", path, error)
+            FILES.labels(mode=self.metrics_mode, status="failed").inc()
+            self._manifest.mark_failed(path, error, elapsed_ms)
+        else:
+            FILES.labels(mode=self.metrics_mode, status="done").inc()
+            self._manifest.mark_done(path, elapsed_ms)
+
+    def run(self):
+        """Processes everything not yet done. Returns the manifest's status counts."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._manifest = JobManifest(self.manifest_path)
+        try:
+            self._manifest.add(self.collect())
+            todo = self._manifest.pending(self.retry_failed)
+            counts = self._manifest.counts()
+            log.info("%d images, %d to do (manifest: %s)", sum(counts.values()), len(todo),
+                     self.manifest_path)
+            if todo:
+                self._open_remover()
+                try:
+                    self._run_jobs(todo, self.metrics_mode)
+                finally:
+                    self._close_remover()
+        finally:
+            self._manifest.close()
+
+        # Fresh connection: the writer thread has flushed everything by now
+        with JobManifest(self.manifest_path) as manifest:
+            return manifest.counts()
+
+    def _run_jobs(self, todo, mode):
+        """
+        Processes (input, outputs) pairs from todo, a list or any iterable
+        (pulled lazily, a few ahead of the workers).
+        """
+        self._encoder = EncoderPool(preset=self.preset)
+        started = time.monotonic()
+        last_log = started
+        in_flight = set()
+        submitted = [0]
+        total = len(todo) if hasattr(todo, "__len__") else None
+        if total is not None:
+            QUEUE_DEPTH.labels(mode=mode, state="pending").set_function(lambda: total - submitted[0])
+        QUEUE_DEPTH.labels(mode=mode, state="in_flight").set_function(
+            lambda: submitted[0] - self._finished)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for path, outputs in todo:
+                    if self._stop.is_set():
+                        break
+                    # Keep a short queue so a stop does not wait on thousands of images
+                    if len(in_flight) >= self.workers * 2:
+                        _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    in_flight.add(executor.submit(self._process, path, outputs))
+                    submitted[0] += 1
+
+                    now = time.monotonic()
+                    if now - last_log >= LOG_INTERVAL:
+                        last_log = now
+                        rate = self._finished / (now - started) * 60
+                        log.info("%d / %s done (%.0f images/min)", self._finished,
+                                 total if total is not None else "?", rate)
+        except KeyboardInterrupt:
+            log.info("Stopping, waiting for images in progress")
+            self._stop.set()
+        finally:
+            self._encoder.close()
+        log.info("Finished %d images in %.1fs", self._finished, time.monotonic() - started)
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,269 @@
+"""
+Command line entry points (headless, no Qt).
+
+    python main.py watch IN_DIR [IN_DIR ...] --output OUT_DIR
+    python main.py batch INPUT [INPUT ...] --output OUT_DIR
+    python main.py shard enqueue|work|status|merge --queue QUEUE_DIR ...
+"""
+import argparse
+import logging
+import os
+
+from core.encoder import PRESETS
+
+
+def add_removal_args(parser):
+    parser.add_argument("--model", default="isnet-general-use",
+                        help="rembg model name, or 'auto' to fit --budget-ms (default: isnet-general-use)")
+    parser.add_argument("--budget-ms", type=float, default=1000,
+                        help="Per-image latency budget used by --model auto")
+    parser.add_argument("--no-alpha-matting", dest="alpha_matting", action="store_false",
+                        help="Disable edge refinement")
+    parser.add_argument("--matting", choices=["full", "band"], default="full",
+                        help="Refine edges over the whole image, or only the band along the outline (faster)")
+    parser.add_argument("--no-post-process", dest="post_process", action="store_false",
+                        help="Disable mask clean-up")
+    parser.add_argument("--fast-paths", action="store_true",
+                        help="Skip the model for images that already have transparency or sit on "
+                             "a flat studio backdrop, when the colour test is confident")
+    parser.add_argument("--background", dest="backgrounds", action="append", metavar="SPEC",
+                        help="Composite onto a background instead of leaving it transparent: "
+                             "a colour (white, #ffcc00), gradient:#fff,#000[:horizontal], "
+                             "image:PATH or blur[:RADIUS]. Repeat for several outputs per image")
+    parser.add_argument("--format", choices=["png", "webp"], default="png",
+                        help="Output format (WebP is lossless)")
+    parser.add_argument("--compression", choices=PRESETS, default="balanced",
+                        help="Encoder compression preset")
+
+
+def add_runtime_args(parser):
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Images processed in parallel")
+    parser.add_argument("--memory-budget", metavar="SIZE",
+                        help="Cap on the process' memory, e.g. 4G. Large images wait for room "
+                             "or are downscaled to fit")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="Write Prometheus metrics to this file (e.g. for node_exporter's textfile collector)")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+
+
+def add_processes_arg(parser):
+    parser.add_argument("--processes", type=int, default=0,
+                        help="Run removal in this many worker processes (images pass through shared "
+                             "memory); 0 runs it in-process. Helps when matting / clean-up "
+                             "keep one process busy")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="AI Background Remover")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    watch = commands.add_parser("watch", help="Process new images dropped into folders")
+    watch.add_argument("inputs", nargs="+", help="Folders to watch")
+    watch.add_argument("-o", "--output", required=True, help="Folder for the cutouts")
+    watch.add_argument("--recursive", action="store_true", help="Watch sub-folders too")
+    watch.add_argument("--existing", action="store_true",
+                       help="Also process images already in the folders")
+    watch.add_argument("--settle", type=float, default=2.0,
+                       help="Seconds a file must stay unchanged before it is read")
+    add_removal_args(watch)
+    add_runtime_args(watch)
+
+    batch = commands.add_parser("batch", help="Process files / folders once, resuming interrupted runs")
+    batch.add_argument("inputs", nargs="+", help="Images or folders")
+    batch.add_argument("-o", "--output", required=True, help="Folder for the cutouts")
+    batch.add_argument("--recursive", action="store_true", help="Include sub-folders")
+    batch.add_argument("--manifest", help="Job database (default: OUTPUT/jobs.sqlite)")
+    batch.add_argument("--retry-failed", action="store_true",
+                       help="Also retry images that failed in an earlier run")
+    add_removal_args(batch)
+    add_runtime_args(batch)
+    add_processes_arg(batch)
+
+    shard = commands.add_parser("shard", help="Share a large job between machines via a shared folder")
+    actions = shard.add_subparsers(dest="action", required=True)
+
+    enqueue = actions.add_parser("enqueue", help="Queue images; removal settings are stored with the queue")
+    enqueue.add_argument("inputs", nargs="+", help="Images or folders (same paths on every node)")
+    enqueue.add_argument("-o", "--output", required=True, help="Shared folder for the cutouts")
+    enqueue.add_argument("--queue", required=True, help="Shared queue folder")
+    enqueue.add_argument("--recursive", action="store_true", help="Include sub-folders")
+    add_removal_args(enqueue)
+
+    work = actions.add_parser("work", help="Process queued images until the queue is empty")
+    work.add_argument("--queue", required=True, help="Shared queue folder")
+    work.add_argument("--lease", type=float, default=600,
+                      help="Seconds before a silent node's images are handed to another")
+    work.add_argument("--wait", action="store_true",
+                      help="Stay until other nodes' images are finished too, taking over expired ones")
+    add_runtime_args(work)
+    add_processes_arg(work)
+
+    status = actions.add_parser("status", help="Show queue progress")
+    status.add_argument("--queue", required=True, help="Shared queue folder")
+
+    merge = actions.add_parser("merge", help="Collect all results into one job manifest")
+    merge.add_argument("--queue", required=True, help="Shared queue folder")
+    merge.add_argument("--manifest", help="Job database (default: OUTPUT/jobs.sqlite)")
+    return parser
+
+
+def parse_backgrounds(specs):
+    from core.composite import Background
+
+    return [Background.parse(spec) for spec in specs or []]
+
+
+def memory_budget(args):
+    if not getattr(args, "memory_budget", None):
+        return None
+    from core.admission import MemoryBudget, parse_size
+
+    return MemoryBudget(parse_size(args.memory_budget))
+
+
+def run_watch(args):
+    from core.watcher import HotFolderWatcher
+
+    watcher = HotFolderWatcher(
+        args.inputs, args.output,
+        model_name=args.model,
+        alpha_matting=args.alpha_matting,
+        post_process=args.post_process,
+        workers=args.workers,
+        settle_time=args.settle,
+        recursive=args.recursive,
+        output_format=args.format,
+        preset=args.compression,
+        process_existing=args.existing,
+        latency_budget_ms=args.budget_ms,
+        matting_mode=args.matting,
+        backgrounds=parse_backgrounds(args.backgrounds),
+        memory_budget=memory_budget(args),
+        fast_paths=args.fast_paths,
+    )
+    watcher.run_forever()
+    return 0
+
+
+def run_batch(args):
+    from core.batch import BatchRunner
+
+    runner = BatchRunner(
+        args.inputs, args.output,
+        manifest_path=args.manifest,
+        model_name=args.model,
+        alpha_matting=args.alpha_matting,
+        post_process=args.post_process,
+        workers=args.workers,
+        recursive=args.recursive,
+        output_format=args.format,
+        preset=args.compression,
+        latency_budget_ms=args.budget_ms,
+        matting_mode=args.matting,
+        backgrounds=parse_backgrounds(args.backgrounds),
+        retry_failed=args.retry_failed,
+        memory_budget=memory_budget(args),
+        processes=args.processes,
+        fast_paths=args.fast_paths,
+    )
+    counts = runner.run()
+    print(", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+    return 1 if counts.get("failed") else 0
+
+
+def removal_config(args):
+    """The removal settings of args, as stored with a shard queue."""
+    return {
+        "model": args.model,
+        "budget_ms": args.budget_ms,
+        "alpha_matting": args.alpha_matting,
+        "matting": args.matting,
+        "post_process": args.post_process,
+        "fast_paths": args.fast_paths,
+        "backgrounds": args.backgrounds or [],
+        "format": args.format,
+        "compression": args.compression,
+    }
+
+
+def run_shard(args):
+    from core.batch import BatchRunner
+    from core.shard import ShardQueue, ShardWorker
+
+    queue = ShardQueue(args.queue, lease_seconds=getattr(args, "lease", 600))
+    if args.action == "enqueue":
+        config = dict(removal_config(args), output=args.output)
+        # Output names depend on the format / backgrounds, so they are fixed here
+        collector = BatchRunner(args.inputs, args.output, recursive=args.recursive,
+                                output_format=args.format,
+                                backgrounds=parse_backgrounds(args.backgrounds))
+        added = queue.enqueue(collector.collect(), config)
+        print(f"Queued {added} images in {args.queue}")
+        return 0
+
+    if args.action == "work":
+        config = queue.config
+        if not config:
+            print(f"{args.queue} has no queue settings; run 'shard enqueue' first")
+            return 2
+        worker = ShardWorker(
+            queue, wait=args.wait,
+            model_name=config["model"],
+            latency_budget_ms=config["budget_ms"],
+            alpha_matting=config["alpha_matting"],
+            matting_mode=config["matting"],
+            post_process=config["post_process"],
+            backgrounds=parse_backgrounds(config["backgrounds"]),
+            output_format=config["format"],
+            preset=config["compression"],
+            workers=args.workers,
+            memory_budget=memory_budget(args),
+            processes=args.processes,
+            fast_paths=config.get("fast_paths", False),
+        )
+        counts = worker.run()
+    elif args.action == "merge":
+        manifest = args.manifest or os.path.join(queue.config.get("output", args.queue), "jobs.sqlite")
+        counts = queue.merge(manifest)
+        print(f"Merged into {manifest}")
+    else:
+        counts = queue.counts()
+    print(", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+    return 0
+
+
+COMMANDS = {
+    "watch": run_watch,
+    "batch": run_batch,
+    "shard": run_shard,
+}
+
+
+def start_metrics(args):
+    """Starts the exporters asked for on the command line; returns a stop function."""
+    from core import metrics
+
+    exporter = server = None
+    if getattr(args, "metrics_file", None):
+        exporter = metrics.TextfileExporter(args.metrics_file).start()
+    if getattr(args, "metrics_port", None):
+        server = metrics.serve_http(args.metrics_port)
+
+    def stop():
+        if server is not None:
+            server.shutdown()
+        if exporter is not None:
+            exporter.stop()
+    return stop
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    stop_metrics = start_metrics(args)
+    try:
+        return COMMANDS[args.command](args)
+    finally:
+        stop_metrics()
@@ -0,0 +1,214 @@
+"""
+Background replacement.
+
+Composites a cutout onto a solid colour, a gradient, an image or a blurred
+copy of the original photo. Blending is integer NumPy arithmetic on the
+image's own depth (uint8, or uint16 for 16-bit sources):
+
+    out = round((fg * a + bg * (max - a)) / max)
+
+The premultiplied foreground and the inverse alpha are computed once per
+cutout, so rendering a mask onto many backgrounds only pays for the blend
+itself. Solid colours and gradients are broadcast, never expanded to full
+frames.
+"""
+import numpy as np
+from PIL import Image, ImageColor, ImageFilter, ImageOps
+
+from core.engine import upright
+
+# Blurred-original backgrounds are blurred at reduced scale, then upscaled
+BLUR_WORK_SIDE = 640
+# Rows blended per step, so the intermediates stay in cache
+BAND_ROWS = 64
+
+
+def _work_dtype(dtype):
+    """Integer type wide enough for fg * a + bg * (max - a)."""
+    if dtype == np.uint8:
+        return np.uint16
+    if dtype == np.uint16:
+        return np.uint32
+    raise ValueError(f"Unsupported image depth: {dtype}")
+
+
+def _div_max(x, bits, out=None):
+    """round(x / (2**bits - 1)) without a division; x is modified."""
+    x += 1 << (bits - 1)
+    x += x >> bits
+    if out is None:
+        x >>= bits
+        return x
+    return np.right_shift(x, bits, out=out, casting="unsafe")
+
+
+def parse_color(value, dtype=np.uint8):
+    """'#ff8800', 'white', (255, 136, 0) -> array of 3 in the given depth."""
+    if isinstance(value, str):
+        value = ImageColor.getrgb(value)[:3]
+    color = np.array(value[:3], dtype=np.uint32)
+    if dtype == np.uint16:
+        color *= 257
+    return color.astype(dtype)
+
+
+class Background:
+    """
+    A background description that is rendered per output size.
+
+    kind: "solid" (colors[0]), "gradient" (colors[0] -> colors[1]),
+        "image" (path or PIL image, cropped to fill) or "blur" (the
+        original photo, blurred by radius pixels).
+    """
+    KINDS = ("solid", "gradient", "image", "blur")
+
+    def __init__(self, kind, colors=(), image=None, vertical=True, radius=25):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown background kind: {kind}")
+        self.kind = kind
+        self.colors = colors
+        self.image = image
+        self.vertical = vertical
+        self.radius = radius
+        self._cache = None  # (size, dtype, pixels) of the last image backdrop
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Parses a command line spec:
+            white | #ffcc00                 solid colour
+            gradient:#ffffff,#3498db[:horizontal]
+            image:path/to/backdrop.jpg
+            blur[:radius]
+        """
+        kind, _, rest = spec.partition(":")
+        if kind == "gradient":
+            colors, _, direction = rest.partition(":")
+            start, _, end = colors.partition(",")
+            if not end:
+                raise ValueError("gradient needs two colours, e.g. gradient:#ffffff,#000000")
+            return cls("gradient", (start, end), vertical=direction != "horizontal")
+        if kind == "image":
+            if not rest:
+                raise ValueError("image needs a path, e.g. image:backdrop.jpg")
+            return cls("image", image=rest)
+        if kind == "blur":
+            return cls("blur", radius=int(rest) if rest else 25)
+        return cls("solid", (spec,))
+
+    def pixels(self, size, dtype=np.uint8, original=None):
+        """
+        Background for a (width, height) output, as an array that broadcasts
+        against HxWx3: (3,) for solid, Hx1x3 / 1xWx3 for gradients.
+        """
+        width, height = size
+        if self.kind == "solid":
+            return parse_color(self.colors[0], dtype)
+
+        if self.kind == "gradient":
+            start = parse_color(self.colors[0], np.uint16).astype(np.float32)
+            end = parse_color(self.colors[1], np.uint16).astype(np.float32)
+            steps = height if self.vertical else width
+            t = np.linspace(0.0, 1.0, steps, dtype=np.float32)[:, None]
+            ramp = start + (end - start) * t
+            if dtype == np.uint8:
+                ramp = ramp / 257.0
+            ramp = (ramp + 0.5).astype(dtype)
+            return ramp[:, None, :] if self.vertical else ramp[None, :, :]
+
+        if self.kind == "blur":
+            if original is None:
+                raise ValueError("A blurred background needs the original image")
+            pixels = np.asarray(_blur_image(original.convert("RGB"), self.radius).resize(
+                size, Image.Resampling.BILINEAR))
+            return pixels.astype(np.uint16) * 257 if dtype == np.uint16 else pixels
+
+        # Image backdrops are the same for every photo of a shoot; keep the last fit
+        cache = self._cache
+        if cache is not None and cache[:2] == (size, dtype):
+            return cache[2]
+        source = self.image
+        if isinstance(source, str):
+            with Image.open(source) as opened:
+                source = opened.convert("RGB")
+        pixels = np.asarray(ImageOps.fit(source.convert("RGB"), size, Image.Resampling.LANCZOS))
+        if dtype == np.uint16:
+            pixels = pixels.astype(np.uint16) * 257
+        self._cache = (size, dtype, pixels)
+        return pixels
+
+
+def _blur_image(img, radius):
+    """Gaussian blur; large images are blurred at reduced scale."""
+    scale = min(1.0, BLUR_WORK_SIDE / max(img.size))
+    if scale < 1.0:
+        small = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = img.resize(small, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return img.filter(ImageFilter.GaussianBlur(max(1.0, radius * scale)))
+
+
+class Compositor:
+    """
+    Composites one cutout onto any number of backgrounds.
+
+    cutout: RGBA PIL image, or an (rgb, alpha) pair of uint8 / uint16 arrays.
+    original: the unprocessed photo, needed for "blur" backgrounds. Its
+        EXIF orientation is applied, like the removers do for the cutout.
+
+    Not thread-safe: the scratch buffer is reused between calls.
+    """
+    def __init__(self, cutout, original=None):
+        if isinstance(cutout, Image.Image):
+            rgba = np.asarray(cutout.convert("RGBA"))
+            rgb, alpha = rgba[..., :3], rgba[..., 3]
+        else:
+            rgb, alpha = cutout
+        if rgb.dtype != alpha.dtype:
+            raise ValueError("rgb and alpha must have the same depth")
+
+        self.dtype = rgb.dtype
+        self.bits = np.iinfo(self.dtype).bits
+        self.size = (rgb.shape[1], rgb.shape[0])
+        # The cutout comes from the upright photo; a sideways original would
+        # give a rotated, stretched blur
+        self.original = upright(original) if original is not None else None
+
+        work = _work_dtype(self.dtype)
+        alpha = alpha[..., None]
+        # Reused by every composite: premultiplied foreground and inverse alpha
+        self._fg = np.multiply(rgb, alpha, dtype=work)
+        self._inv = np.subtract(np.iinfo(self.dtype).max, alpha, dtype=work)
+        self._work = np.empty((min(BAND_ROWS, rgb.shape[0]),) + self._fg.shape[1:], dtype=work)
+
+    def composite(self, background, out=None):
+        """HxWx3 array of the cutout over background (a Background or spec string)."""
+        if isinstance(background, str):
+            background = Background.parse(background)
+        bg = background.pixels(self.size, self.dtype, self.original)
+
+        if out is None:
+            out = np.empty(self._fg.shape, dtype=self.dtype)
+        height = out.shape[0]
+        for top in range(0, height, BAND_ROWS):
+            bottom = min(height, top + BAND_ROWS)
+            work = self._work[:bottom - top]
+            # Gradients / images vary per row, solid colours broadcast as is
+            bg_rows = bg[top:bottom] if bg.ndim == 3 and bg.shape[0] > 1 else bg
+            np.multiply(self._inv[top:bottom], bg_rows, out=work)
+            work += self._fg[top:bottom]
+            _div_max(work, self.bits, out=out[top:bottom])
+        return out
+
+    def composite_image(self, background):
+        """As composite(), as an RGB PIL image (8-bit cutouts only)."""
+        return Image.fromarray(self.composite(background))
+
+    def composite_many(self, backgrounds):
+        """Yields one RGB image per background, reusing the cutout's setup."""
+        for background in backgrounds:
+            yield self.composite_image(background)
+
+
+def replace_background(cutout, background, original=None):
+    """One-off helper: RGBA cutout over background, as an RGB image."""
+    return Compositor(cutout, original).composite_image(background)
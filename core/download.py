@@ -0,0 +1,129 @@
+"""
+Streaming model download with resume and integrity check.
+
+Models are large (u2net is ~170MB) and phones are on flaky connections, so
+the file is streamed in chunks to '<dest>.part', resumed with an HTTP Range
+request after a drop, hashed on the way and only renamed over dest once the
+checksum matches. A half-downloaded file can never be loaded as a model.
+"""
+import hashlib
+import http.client
+import os
+import time
+import urllib.error
+import urllib.request
+
+CHUNK_SIZE = 1 << 20  # 1MB
+
+
+class DownloadError(Exception):
+    pass
+
+
+def parse_checksum(checksum):
+    """'sha256:<hex>' / 'md5:<hex>' -> (algorithm, hex). A bare hex digest is SHA-256."""
+    if ":" in checksum:
+        algorithm, digest = checksum.split(":", 1)
+    else:
+        algorithm, digest = "sha256", checksum
+    algorithm = algorithm.lower()
+    if algorithm not in hashlib.algorithms_available:
+        raise ValueError(f"Unsupported checksum algorithm: {algorithm}")
+    return algorithm, digest.lower()
+
+
+def file_digest(path, algorithm="sha256", chunk_size=CHUNK_SIZE):
+    hasher = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _content_total(response, offset):
+    content_range = response.headers.get("Content-Range")
+    if content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        if total.isdigit():
+            return int(total)
+    length = response.headers.get("Content-Length")
+    return offset + int(length) if length and length.isdigit() else None
+
+
+def _fetch(url, part_path, algorithm, chunk_size, timeout, progress):
+    """Streams url into part_path, resuming what is there. Returns the hex digest."""
+    hasher = hashlib.new(algorithm)
+    offset = 0
+    if os.path.exists(part_path):
+        # Re-hash what we already have so the final digest covers the whole file
+        with open(part_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                hasher.update(chunk)
+                offset += len(chunk)
+
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 416 and offset:
+            return hasher.hexdigest()  # Nothing left to fetch
+        raise
+
+    with response:
+        if offset and response.status != 206:
+            # Server ignored the Range header, start over
+            hasher = hashlib.new(algorithm)
+            offset = 0
+        total = _content_total(response, offset)
+        done = offset
+        with open(part_path, "ab" if offset else "wb") as f:
+            for chunk in iter(lambda: response.read(chunk_size), b""):
+                f.write(chunk)
+                hasher.update(chunk)
+                done += len(chunk)
+                if progress:
+                    progress(done, total)
+
+    if total is not None and done < total:
+        raise DownloadError(f"Connection closed at {done} of {total} bytes")
+    return hasher.hexdigest()
+
+
+def download_file(url, dest, checksum=None, progress=None, retries=5,
+                  chunk_size=CHUNK_SIZE, timeout=30):
+    """
+    Downloads url to dest.
+
+    checksum: 'sha256:<hex>' (or another hashlib algorithm), verified before
+        dest is created. A mismatch discards the partial file.
+    progress: optional callable(done_bytes, total_bytes_or_None).
+    retries: reconnect attempts; each one resumes from the bytes already on disk.
+    """
+    algorithm, expected = parse_checksum(checksum) if checksum else ("sha256", None)
+    part_path = dest + ".part"
+
+    for attempt in range(retries + 1):
+        try:
+            digest = _fetch(url, part_path, algorithm, chunk_size, timeout, progress)
+        except urllib.error.HTTPError as e:
+            if e.code < 500 or attempt == retries:
+                raise  # 404 etc. won't fix itself
+            time.sleep(min(2 ** attempt, 10))
+            continue
+        except (OSError, http.client.HTTPException, DownloadError) as e:
+            if attempt == retries:
+                raise DownloadError(f"Download of {url} failed: {e}") from e
+            time.sleep(min(2 ** attempt, 10))
+            continue
+
+        if expected and digest != expected:
+            os.remove(part_path)
+            if attempt == retries:
+                raise DownloadError(f"Checksum mismatch for {url}: expected {expected}, got {digest}")
+            continue
+
+        os.replace(part_path, dest)
+        return dest
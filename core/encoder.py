@@ -0,0 +1,103 @@
+"""
+Output encoding for processed images.
+
+A large RGBA PNG at Pillow's default settings takes seconds to encode, so
+callers hand the work to a background thread (GUI) or an EncoderPool (batch)
+instead of saving on the thread that owns the UI or the model.
+"""
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# zlib strategies, passed to Pillow's PNG encoder as "compress_type"
+Z_DEFAULT_STRATEGY = 0
+Z_FILTERED = 1
+Z_HUFFMAN_ONLY = 2
+Z_RLE = 3
+
+PRESETS = ("fast", "balanced", "smallest")
+
+PNG_OPTIONS = {
+    "fast": {"compress_level": 1, "compress_type": Z_RLE},
+    "balanced": {"compress_level": 6, "compress_type": Z_DEFAULT_STRATEGY},
+    "smallest": {"compress_level": 9, "compress_type": Z_FILTERED, "optimize": True},
+}
+
+# Lossless WebP: "quality" is encoder effort here, not fidelity
+WEBP_OPTIONS = {
+    "fast": {"lossless": True, "quality": 0, "method": 0},
+    "balanced": {"lossless": True, "quality": 75, "method": 4},
+    "smallest": {"lossless": True, "quality": 100, "method": 6},
+}
+
+EXTENSIONS = {".png": "PNG", ".webp": "WEBP"}
+
+
+def format_for_path(path):
+    """Output format from the file extension, PNG if unknown."""
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower(), "PNG")
+
+
+def encode_options(fmt, preset="balanced"):
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown compression preset: {preset}")
+    table = WEBP_OPTIONS if fmt == "WEBP" else PNG_OPTIONS
+    return dict(table[preset])
+
+
+def save_image(image, path, preset="balanced", fmt=None):
+    """
+    Encodes image to path with the given compression preset.
+    The file is written under a temporary name and renamed when complete,
+    so an interrupted save never leaves a truncated result behind. The
+    temporary name is unique per host, process and thread, so workers on
+    other machines writing the same output (core.shard) never share it.
+    """
+    fmt = fmt or format_for_path(path)
+    tmp_path = f"{path}.{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}.part"
+    try:
+        image.save(tmp_path, format=fmt, **encode_options(fmt, preset))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+class EncoderPool:
+    """
+    Encoder pool for batch runs, kept separate from the inference workers so
+    slow PNG/WebP encoding doesn't stall the model. Pillow releases the GIL
+    while encoding, so threads scale; processes=True trades pickling for
+    full isolation.
+
+    submit() blocks once max_pending images are queued, which bounds the
+    memory held by results waiting to be written.
+    """
+    def __init__(self, workers=None, preset="balanced", processes=False, max_pending=None):
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.preset = preset
+        executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        self._executor = executor_class(max_workers=self.workers)
+        self._slots = threading.BoundedSemaphore(max_pending or self.workers * 2)
+
+    def submit(self, image, path, preset=None, fmt=None):
+        """Queues image for encoding. Returns a Future resolving to the path."""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(save_image, image, path, preset or self.preset, fmt)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def close(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,201 @@
+"""
+Shared segmentation engine for the desktop and mobile removers.
+
+Depends only on onnxruntime, NumPy and Pillow (no rembg / scipy), so the
+same code runs in the desktop app and in the Android build. Preprocessing
+follows the per-model spec in core.models, which keeps both front ends on
+identical normalisation and resizing.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from core.download import download_file
+from core.guided import guided_upsample
+from core.metrics import REGISTRY
+from core.models import get_spec, supports_input_size
+from core.preprocess import Preprocessor
+from core.threads import default_thread_count, load_cached, tuned_thread_count
+
+EXIF_ORIENTATION = 0x0112
+# Context kept around a region of interest, as a fraction of its longer side
+ROI_PADDING = 0.1
+ROI_MIN_PADDING = 16
+
+INFERENCE_SECONDS = REGISTRY.histogram("bgremover_inference_seconds", "Model inference time (session.run).",
+                                       ["model", "input_size"])
+
+
+def upright(img):
+    """Applies the EXIF orientation, without copying when there is none."""
+    if img.getexif().get(EXIF_ORIENTATION, 1) != 1:
+        return ImageOps.exif_transpose(img)
+    return img
+
+
+def padded_box(bbox, size, padding=ROI_PADDING):
+    """
+    Region of interest (left, top, right, bottom) grown by padding so the
+    model sees some background around the subject, clipped to size.
+    """
+    width, height = size
+    x0, x1 = sorted((round(bbox[0]), round(bbox[2])))
+    y0, y1 = sorted((round(bbox[1]), round(bbox[3])))
+    pad = max(ROI_MIN_PADDING, round(max(x1 - x0, y1 - y0) * padding))
+    box = (max(0, x0 - pad), max(0, y0 - pad), min(width, x1 + pad), min(height, y1 + pad))
+    if box[2] <= box[0] or box[3] <= box[1]:
+        raise ValueError(f"Region {tuple(bbox)} lies outside the {width}x{height} image")
+    return box
+
+
+def create_session(model_path, threads=None):
+    import onnxruntime as ort
+
+    sess_options = ort.SessionOptions()
+    if threads:
+        sess_options.intra_op_num_threads = threads
+        sess_options.inter_op_num_threads = 1
+    return ort.InferenceSession(model_path, sess_options, providers=['CPUExecutionProvider'])
+
+
+class Engine:
+    """
+    One ONNX segmentation model: preprocessing, inference and mask
+    post-processing. Thread-safe; several workers may share one Engine.
+    """
+    def __init__(self, spec, model_path, input_size=None, threads=None, benchmarks=None, upsample="guided"):
+        """
+        spec: core.models.ModelSpec (or its name).
+        input_size: square input side, None for native. Falls back to native
+            when the model has a static input shape.
+        benchmarks: optional BenchmarkStore receiving measured latencies.
+        upsample: "guided" (edge-aware, see core.guided) or "lanczos" for
+            scaling the mask back to the image size.
+        """
+        self.spec = get_spec(spec) if isinstance(spec, str) else spec
+        self.model_path = model_path
+        self.threads = threads
+        self.upsample = upsample
+        self.benchmarks = benchmarks
+        self.session = create_session(model_path, threads)
+
+        # Names are looked up once, not on every call
+        model_input = self.session.get_inputs()[0]
+        output = self.session.get_outputs()[0]
+        self.input_name = model_input.name
+        self.output_name = output.name
+        # A fully static model lets every thread bind a preallocated output
+        # buffer up front; with symbolic dimensions the first run finds the shape
+        self._output_shape = None
+        if all(isinstance(d, int) for d in list(model_input.shape) + list(output.shape)):
+            self._output_shape = tuple(output.shape)
+        self._use_binding = output.type == "tensor(float)"
+        self._local = threading.local()
+
+        self.input_size = input_size or self.spec.input_size
+        if not supports_input_size(self.session, self.input_size):
+            if benchmarks is not None:
+                benchmarks.mark_fixed_input(self.spec.name)
+            self.input_size = self.spec.input_size
+
+        self._inference_seconds = INFERENCE_SECONDS.labels(model=self.spec.name, input_size=self.input_size)
+
+        self.preprocess = Preprocessor(
+            (self.input_size, self.input_size), self.spec.mean, self.spec.std,
+            resample=Image.Resampling.LANCZOS, normalize_max=True, reducing_gap=3.0
+        )
+
+    @classmethod
+    def load(cls, spec, model_dir, input_size=None, threads=None, calibrate=False,
+             progress=None, benchmarks=None, upsample="guided"):
+        """
+        Engine for spec with its model in model_dir, downloading (and verifying)
+        it first if needed.
+
+        threads: fixed intra-op count; otherwise the count cached by an earlier
+            calibration, or with calibrate=True measure it now. Without either,
+            ONNX Runtime's own default (see default_thread_count).
+        progress: optional callable(done_bytes, total_bytes) for the download.
+        """
+        spec = get_spec(spec) if isinstance(spec, str) else spec
+        os.makedirs(model_dir, exist_ok=True)
+        model_path = os.path.join(model_dir, spec.filename)
+        if not os.path.exists(model_path):
+            download_file(spec.url, model_path, checksum=spec.checksum, progress=progress)
+
+        if not threads:
+            cache_path = os.path.join(model_dir, "threads.json")
+            if calibrate:
+                threads = tuned_thread_count(model_path, lambda n: create_session(model_path, n), cache_path)
+            else:
+                threads = load_cached(cache_path, model_path) or default_thread_count()
+        return cls(spec, model_path, input_size=input_size, threads=threads, benchmarks=benchmarks,
+                   upsample=upsample)
+
+    def _binding(self):
+        """This thread's IOBinding, with the mask output bound to a reusable buffer when possible."""
+        local = self._local
+        if getattr(local, "binding", None) is None or (local.output is None and self._output_shape):
+            local.binding = self.session.io_binding()
+            local.output = None
+            if self._output_shape:
+                local.output = np.empty(self._output_shape, dtype=np.float32)
+                local.binding.bind_output(self.output_name, "cpu", 0, np.float32,
+                                          list(self._output_shape), local.output.ctypes.data)
+            else:
+                # Shape unknown yet: onnxruntime allocates this output only
+                local.binding.bind_output(self.output_name, "cpu")
+        return local.binding, local.output
+
+    def infer(self, tensor):
+        """
+        Runs the model and returns the mask output. With IOBinding only that
+        output is copied out, into this thread's buffer, which the next call
+        on the same thread overwrites.
+        """
+        if not self._use_binding:
+            return self.session.run([self.output_name], {self.input_name: tensor})[0]
+
+        binding, output = self._binding()
+        binding.bind_cpu_input(self.input_name, tensor)
+        self.session.run_with_iobinding(binding)
+        if output is None:
+            output = binding.copy_outputs_to_cpu()[0]
+            self._output_shape = output.shape
+        return output
+
+    def predict(self, img: Image.Image) -> np.ndarray:
+        """Soft mask at model resolution, float32 in 0..1."""
+        tensor = self.preprocess(img)
+
+        start = time.perf_counter()
+        pred = self.infer(tensor)
+        elapsed = time.perf_counter() - start
+        self._inference_seconds.observe(elapsed)
+        if self.benchmarks is not None:
+            self.benchmarks.record(self.spec.name, self.input_size, elapsed * 1000)
+
+        # The models already end in a sigmoid; stretch to the full range like rembg
+        pred = pred[0, 0]
+        lo, hi = float(pred.min()), float(pred.max())
+        return (pred - lo) / (hi - lo) if hi > lo else np.zeros_like(pred)
+
+    def mask(self, img: Image.Image) -> Image.Image:
+        """Soft mask as an 'L' image at the input image size."""
+        pred = self.predict(img)
+        if self.upsample == "guided" and max(img.size) > self.input_size:
+            # The full-resolution image steers the upscale, edges stay crisp
+            return guided_upsample(pred, img)
+        mask_img = Image.fromarray((pred * 255 + 0.5).astype(np.uint8))
+        return mask_img.resize(img.size, Image.Resampling.LANCZOS)
+
+    def cutout(self, img: Image.Image, mask: Image.Image = None) -> Image.Image:
+        """RGBA copy of img with the predicted (or given) mask as alpha."""
+        if mask is None:
+            mask = self.mask(img)
+        out = img.convert("RGBA")
+        out.putalpha(mask)
+        return out
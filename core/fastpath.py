@@ -0,0 +1,169 @@
+"""
+Cheap pre-classification that skips the network when it is not needed.
+
+Two kinds of input do not need the segmentation model:
+- images that already carry a meaningful alpha channel (earlier cutouts,
+  logos, renders) are passed through unchanged;
+- product shots on a flat studio backdrop, where the colour distance to the
+  backdrop already is a good mask.
+
+classify() decides from the image border and a small thumbnail in a few
+milliseconds and scores its confidence. Only when the score is high enough
+is the full-resolution mask computed; otherwise the caller runs the model
+as usual.
+"""
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image, ImageChops
+
+PASSTHROUGH = "alpha"
+FLAT = "flat"
+MODEL = "model"
+
+# Images scoring below this go to the model
+MIN_CONFIDENCE = 0.9
+# Side of the thumbnail the coverage / separation checks run on
+WORK_SIDE = 256
+# Images with a shorter side below this are too small to tell backdrop from subject
+MIN_SIDE = 16
+# Border strips sampled for the backdrop colour, as a fraction of the shorter side
+BORDER = 0.03
+# Colour distance (max over channels) always treated as backdrop noise, and
+# the most a backdrop may vary before it no longer counts as flat
+MIN_TOLERANCE = 12
+MAX_TOLERANCE = 40
+# Alpha ramps from 0 to 255 over this many distance levels past the tolerance
+RAMP = 24
+
+Decision = namedtuple("Decision", "kind confidence color tolerance")
+
+
+def _score(value, bad, good):
+    """Linear 0..1 score, 0 at bad and 1 at good."""
+    return float(np.clip((value - bad) / (good - bad), 0.0, 1.0))
+
+
+def _thumbnail(img):
+    """Reduced copy with the longest side at most WORK_SIDE (no full-size copy first)."""
+    scale = WORK_SIDE / max(img.size)
+    if scale >= 1:
+        return img
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    return img.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+
+def _alpha_channel(img):
+    if img.mode in ("RGBA", "LA", "PA"):
+        return img.getchannel("A")
+    if img.mode == "P" and "transparency" in img.info:
+        return img.convert("RGBA").getchannel("A")
+    return None
+
+
+def _alpha_decision(alpha):
+    """Passes images whose alpha already separates a subject from the background."""
+    lo, hi = alpha.getextrema()
+    if lo > 250 or hi < 5:
+        return None  # Opaque (alpha unused) or blank
+    a = np.asarray(_thumbnail(alpha))
+    # Both clearly see-through and clearly solid areas, not a faint overall fade
+    transparent = float(np.mean(a < 16))
+    opaque = float(np.mean(a > 240))
+    confidence = min(_score(transparent, 0.0, 0.01), _score(opaque, 0.0, 0.01))
+    return Decision(PASSTHROUGH, confidence, None, None)
+
+
+def _border_pixels(img):
+    """Pixels of the four border strips at full resolution, (n, 3) uint8."""
+    width, height = img.size
+    # At least 2px, but never so wide that opposite strips cross
+    b = min(max(2, round(min(width, height) * BORDER)), min(width, height) // 2)
+    strips = [(0, 0, width, b), (0, height - b, width, height),
+              (0, b, b, height - b), (width - b, b, width, height - b)]
+    return np.concatenate([np.asarray(img.crop(box)).reshape(-1, 3) for box in strips])
+
+
+def _reaches_border(bg):
+    """Pixels of the boolean mask bg connected to the image border through bg."""
+    reach = np.zeros_like(bg)
+    reach[0], reach[-1], reach[:, 0], reach[:, -1] = bg[0], bg[-1], bg[:, 0], bg[:, -1]
+    for _ in range(4 * WORK_SIDE):
+        grown = reach.copy()
+        grown[1:] |= reach[:-1]
+        grown[:-1] |= reach[1:]
+        grown[:, 1:] |= reach[:, :-1]
+        grown[:, :-1] |= reach[:, 1:]
+        grown &= bg
+        if np.array_equal(grown, reach):
+            break
+        reach = grown
+    return reach
+
+
+def _flat_decision(rgb):
+    """Scores how well a colour-distance mask would separate rgb from its backdrop."""
+    if min(rgb.size) < MIN_SIDE:
+        return Decision(FLAT, 0.0, None, None)
+    border = _border_pixels(rgb)
+    color = np.median(border, axis=0).astype(np.int16)
+    dist = np.abs(border.astype(np.int16) - color).max(axis=1)
+    # Backdrop noise: JPEG artefacts, sensor noise, slight falloff
+    tolerance = max(MIN_TOLERANCE, 3 * float(np.median(dist)))
+    if tolerance > MAX_TOLERANCE:
+        return Decision(FLAT, 0.0, color, tolerance)
+    # Subjects cropped by the frame cover part of the border, clutter covers most
+    backdrop = _score(float(np.mean(dist <= tolerance)), 0.6, 0.9)
+
+    d = np.abs(np.asarray(_thumbnail(rgb)).astype(np.int16) - color).max(axis=2)
+    bg = d <= tolerance
+    fg_area = max(int(np.count_nonzero(~bg)), 1)
+    coverage = 1.0 - float(np.mean(bg))
+    # A subject at all, and not one the backdrop test mostly misses
+    subject = min(_score(coverage, 0.002, 0.01), _score(coverage, 0.95, 0.85))
+    # Wide soft zones mean the subject blends into the backdrop (shadows, white on white)
+    ramp = np.count_nonzero((d > tolerance) & (d < tolerance + RAMP))
+    separation = _score(ramp / fg_area, 0.3, 0.1)
+    # Backdrop-coloured areas inside the subject: holes, or parts of it the
+    # colour test would cut out; either way the model should decide
+    enclosed = np.count_nonzero(bg & ~_reaches_border(bg))
+    solid = _score(enclosed / fg_area, 0.05, 0.01)
+    return Decision(FLAT, min(backdrop, subject, separation, solid), color, tolerance)
+
+
+def classify(img: Image.Image) -> Decision:
+    """Which path img should take, with the confidence of that call."""
+    alpha = _alpha_channel(img)
+    if alpha is not None:
+        decision = _alpha_decision(alpha)
+        if decision is not None:
+            return decision
+    rgb = img if img.mode == "RGB" else img.convert("RGB")
+    return _flat_decision(rgb)
+
+
+def flat_mask(img: Image.Image, color, tolerance) -> Image.Image:
+    """'L' mask from each pixel's colour distance to the backdrop colour."""
+    rgb = img if img.mode == "RGB" else img.convert("RGB")
+    # Lookup tables keep the full-resolution pass in PIL's C loops: per-channel
+    # distance, the largest of the three, then the alpha ramp
+    distance = [abs(v - int(c)) for c in color for v in range(256)]
+    r, g, b = rgb.point(distance).split()
+    d = ImageChops.lighter(ImageChops.lighter(r, g), b)
+    ramp = [min(255, max(0, round((v - tolerance) * 255 / RAMP))) for v in range(256)]
+    return d.point(ramp)
+
+
+def fast_cutout(img: Image.Image, min_confidence=MIN_CONFIDENCE):
+    """
+    Returns (cutout, decision): an RGBA cutout made without the model, or
+    None when the model is needed.
+    """
+    decision = classify(img)
+    if decision.confidence < min_confidence:
+        return None, decision
+    if decision.kind == PASSTHROUGH:
+        return img.convert("RGBA"), decision
+    out = img.convert("RGBA")
+    out.putalpha(flat_mask(img, decision.color, decision.tolerance))
+    return out, decision
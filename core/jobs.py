@@ -0,0 +1,151 @@
+"""
+Persistent job manifest for batch runs.
+
+Every input of a batch gets a row in a small SQLite database (status,
+outputs, timing, last error), so an interrupted run picks up where it
+stopped instead of starting over. Rows whose source file changed since it
+was processed are queued again.
+
+Status updates are put on a queue and written by one thread in batched
+transactions (WAL journal, synchronous=NORMAL), so recording progress costs
+a handful of commits per second regardless of the image rate.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    input      TEXT PRIMARY KEY,
+    outputs    TEXT,
+    size       INTEGER,
+    mtime      REAL,
+    status     TEXT NOT NULL DEFAULT 'pending',
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    elapsed_ms REAL,
+    finished   REAL,
+    error      TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+"""
+
+# Re-queue a known input only when its file (or target) changed
+UPSERT = """
+INSERT INTO jobs (input, outputs, size, mtime) VALUES (?, ?, ?, ?)
+ON CONFLICT (input) DO UPDATE SET
+    outputs = excluded.outputs, size = excluded.size, mtime = excluded.mtime,
+    status = 'pending', attempts = 0, error = NULL
+WHERE jobs.size != excluded.size OR jobs.mtime != excluded.mtime
+    OR jobs.outputs != excluded.outputs
+"""
+
+UPDATE = """
+UPDATE jobs SET status = ?, elapsed_ms = ?, error = ?, finished = ?, attempts = attempts + 1
+WHERE input = ?
+"""
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class JobManifest:
+    """
+    SQLite-backed record of a batch.
+
+    Reads (add, pending, counts) run on the caller's connection; status
+    updates (mark_done, mark_failed) are thread-safe and only queued, then
+    written by a background thread every flush_interval seconds or every
+    batch_size updates. Call close() (or use it as a context manager) so the
+    tail of the queue is written.
+    """
+    def __init__(self, path, flush_interval=0.5, batch_size=1000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = _connect(path)
+        self._conn.executescript(SCHEMA)
+
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="job-manifest", daemon=True)
+        self._writer.start()
+
+    def add(self, jobs):
+        """
+        Registers (input, outputs, size, mtime) rows. outputs is a list of
+        paths. New inputs and inputs whose file changed become pending;
+        finished, unchanged ones are left alone.
+        """
+        rows = ((path, "\n".join(outputs), size, mtime) for path, outputs, size, mtime in jobs)
+        with self._conn:
+            self._conn.executemany(UPSERT, rows)
+
+    def pending(self, retry_failed=False):
+        """(input, [outputs]) of everything still to do, in input order."""
+        statuses = (PENDING, FAILED) if retry_failed else (PENDING,)
+        marks = ",".join("?" * len(statuses))
+        cursor = self._conn.execute(
+            f"SELECT input, outputs FROM jobs WHERE status IN ({marks}) ORDER BY input", statuses
+        )
+        return [(path, outputs.split("\n")) for path, outputs in cursor]
+
+    def counts(self):
+        """{status: number of inputs}."""
+        return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+
+    def failures(self):
+        """(input, error) of failed inputs."""
+        return list(self._conn.execute("SELECT input, error FROM jobs WHERE status = ? ORDER BY input",
+                                       (FAILED,)))
+
+    def mark_done(self, path, elapsed_ms):
+        self._queue.put((DONE, elapsed_ms, None, time.time(), path))
+
+    def mark_failed(self, path, error, elapsed_ms=None):
+        self._queue.put((FAILED, elapsed_ms, str(error), time.time(), path))
+
+    def _write_loop(self):
+        conn = _connect(self.path)
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            with conn:
+                conn.executemany(UPDATE, batch)
+        conn.close()
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
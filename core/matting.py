@@ -0,0 +1,219 @@
+"""
+Edge-band alpha refinement.
+
+Full alpha matting solves for every pixel of the image even though only a
+thin band around the object outline is actually uncertain. Here the image is
+split into tiles, tiles that are solid foreground or background (and whose
+neighbours agree) are skipped, and inside the remaining tiles only the
+trimap's unknown pixels are refined. Those are kept as compact coordinate
+arrays and written back at the end, so the cost follows the object's
+perimeter, not the image area.
+
+Each unknown pixel gets local foreground/background colours F and B (means
+of the definite pixels in a window, from per-region integral images). Alpha is
+the projection of the pixel colour onto the B -> F line, and the colour is
+un-mixed from B for a clean cutout.
+"""
+import numpy as np
+from PIL import Image
+
+from core.refine import erode_mask
+
+TILE_SIZE = 64
+# Most tiles merged into one solved region along each axis
+MAX_MERGE = 8
+
+# Below this F/B colour distance (in grey levels) the estimate is unreliable
+# and the network's mask is trusted instead
+MIN_CONTRAST = 40.0
+
+
+def _tile_classes(mask, fg_threshold, bg_threshold, tile):
+    """Per-tile code: 0 all background, 1 all foreground, 2 mixed."""
+    h, w = mask.shape
+    th, tw = -(-h // tile), -(-w // tile)
+    padded = np.pad(mask, ((0, th * tile - h), (0, tw * tile - w)), mode="edge")
+    blocks = padded.reshape(th, tile, tw, tile)
+    lo = blocks.min(axis=(1, 3))
+    hi = blocks.max(axis=(1, 3))
+    classes = np.full((th, tw), 2, dtype=np.uint8)
+    classes[hi <= bg_threshold] = 0
+    classes[lo >= fg_threshold] = 1
+    return classes
+
+
+def _band_rects(mask, fg_threshold, bg_threshold, erode, tile):
+    """
+    Yields pixel rectangles (y0, x0, y1, x1) covering every tile that can
+    hold unknown pixels. Neighbouring candidate tiles are merged (runs along
+    a tile row, then runs over the same columns in the following rows, up
+    to MAX_MERGE tiles each way), so they share one margin instead of each
+    solving its own overlapping one.
+    """
+    h, w = mask.shape
+    classes = _tile_classes(mask, fg_threshold, bg_threshold, tile)
+    # Erosion reaches into neighbouring tiles; a tile whose neighbourhood is not
+    # one uniform class may contain unknown pixels
+    reach = max(1, -(-erode // tile))
+    candidates = (erode_mask(classes, reach) != erode_mask(classes, -reach)) | (classes == 2)
+
+    rects = []
+    growing = {}  # (tx0, tx1) -> index in rects of the rectangle ending on the previous row
+    for ty in range(candidates.shape[0]):
+        columns = np.flatnonzero(candidates[ty])
+        runs = np.split(columns, np.flatnonzero(np.diff(columns) > 1) + 1) if len(columns) else []
+        extended = {}
+        for run in runs:
+            for tx0 in range(run[0], run[-1] + 1, MAX_MERGE):
+                span = (tx0, min(run[-1] + 1, tx0 + MAX_MERGE))
+                index = growing.get(span)
+                if index is not None and ty - rects[index][0] < MAX_MERGE:
+                    rects[index][2] = ty + 1
+                else:
+                    rects.append([ty, span[0], ty + 1, span[1]])
+                    index = len(rects) - 1
+                extended[span] = index
+        growing = extended
+
+    for ty0, tx0, ty1, tx1 in rects:
+        yield ty0 * tile, tx0 * tile, min(h, ty1 * tile), min(w, tx1 * tile)
+
+
+def _trimap(mask, rect, margin, fg_threshold, bg_threshold, erode):
+    """
+    Region bounds (rect grown by margin), the eroded definite fg / bg masks of
+    the region, and the unknown pixels (ys, xs) of rect, relative to the region.
+    margin must be at least erode for the erosion inside rect to be exact.
+    """
+    h, w = mask.shape
+    y0, x0, y1, x1 = rect
+    ry0, rx0 = max(0, y0 - margin), max(0, x0 - margin)
+    ry1, rx1 = min(h, y1 + margin), min(w, x1 + margin)
+
+    region = mask[ry0:ry1, rx0:rx1]
+    fg = erode_mask(np.where(region >= fg_threshold, 255, 0).astype(np.uint8), erode) > 0
+    bg = erode_mask(np.where(region <= bg_threshold, 255, 0).astype(np.uint8), erode) > 0
+
+    core = (slice(y0 - ry0, y1 - ry0), slice(x0 - rx0, x1 - rx0))
+    ys, xs = np.nonzero(~(fg[core] | bg[core]))
+    return (ry0, rx0, ry1, rx1), fg, bg, ys + core[0].start, xs + core[1].start
+
+
+def _erode_radius(erode):
+    """
+    rembg erodes the trimap with an erode x erode square; erode_mask takes a
+    radius, i.e. a (2r + 1) square.
+    """
+    return erode // 2
+
+
+def band_coordinates(mask, fg_threshold=240, bg_threshold=10, erode=10, tile=TILE_SIZE):
+    """(ys, xs) int32 arrays of the trimap's unknown band."""
+    mask = np.asarray(mask)
+    erode = _erode_radius(erode)
+    all_ys, all_xs = [], []
+    for rect in _band_rects(mask, fg_threshold, bg_threshold, erode, tile):
+        (ry0, rx0, _, _), _, _, ys, xs = _trimap(mask, rect, erode, fg_threshold, bg_threshold, erode)
+        all_ys.append(ys + ry0)
+        all_xs.append(xs + rx0)
+    if not all_ys:
+        return np.empty(0, np.int32), np.empty(0, np.int32)
+    return np.concatenate(all_ys).astype(np.int32), np.concatenate(all_xs).astype(np.int32)
+
+
+def _integral(rgb, weights):
+    """
+    Summed-area table of rgb * weights and of weights (4 channels), with a
+    leading zero row/column. Integer sums are exact; int32 holds them for
+    regions up to MAX_MERGE tiles plus margins.
+    """
+    h, w = weights.shape
+    values = np.empty((h, w, 4), dtype=np.int32)
+    np.multiply(rgb, weights[..., None], out=values[..., :3])
+    values[..., 3] = weights
+    table = np.zeros((h + 1, w + 1, 4), dtype=np.int32)
+    np.cumsum(np.cumsum(values, axis=0, out=values), axis=1, out=table[1:, 1:])
+    return table
+
+
+def _window_sums(table, ys, xs, radius):
+    h, w = table.shape[0] - 1, table.shape[1] - 1
+    y0 = np.clip(ys - radius, 0, h)
+    y1 = np.clip(ys + radius + 1, 0, h)
+    x0 = np.clip(xs - radius, 0, w)
+    x1 = np.clip(xs + radius + 1, 0, w)
+    return table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0]
+
+
+def refine_band(image, mask, fg_threshold=240, bg_threshold=10, erode=10, radius=15, tile=TILE_SIZE):
+    """
+    Refines alpha (and un-mixes colour) only inside the trimap's unknown band.
+
+    image: PIL image, mask: 'L' image or uint8 array of the same size.
+    fg_threshold / bg_threshold / erode: trimap settings, same meaning as
+        rembg's alpha matting options (erode is the side of the erosion
+        square, so the unknown band matches full matting's).
+    radius: window for the local foreground / background colour estimates;
+        pixels deep inside a wide band retry with up to 4x the window.
+
+    Returns an RGBA image.
+    """
+    rgb = np.array(image.convert("RGB"))
+    alpha = np.array(mask, dtype=np.uint8)
+
+    updates = []
+    erode = _erode_radius(erode)
+    for rect in _band_rects(alpha, fg_threshold, bg_threshold, erode, tile):
+        ys = None
+        for scale in (1, 2, 4):
+            # The region only has to hold this scale's windows plus the erosion's
+            # reach. Wider retries cover just the pixels still lacking samples.
+            (ry0, rx0, ry1, rx1), fg, bg, rys, rxs = _trimap(alpha, rect, erode + scale * radius,
+                                                              fg_threshold, bg_threshold, erode)
+            if ys is None:
+                if not len(rys):
+                    break
+                ys, xs = rys + ry0, rxs + rx0
+                fg_sums = np.empty((len(ys), 4))
+                bg_sums = np.empty((len(ys), 4))
+                todo = np.arange(len(ys))
+            region_rgb = rgb[ry0:ry1, rx0:rx1]
+            fg_sums[todo] = _window_sums(_integral(region_rgb, fg), ys[todo] - ry0, xs[todo] - rx0, radius * scale)
+            bg_sums[todo] = _window_sums(_integral(region_rgb, bg), ys[todo] - ry0, xs[todo] - rx0, radius * scale)
+            # Widen the window only where one side has no samples yet
+            todo = todo[(fg_sums[todo, 3] == 0) | (bg_sums[todo, 3] == 0)]
+            if not len(todo):
+                break
+            rect = (ys[todo].min(), xs[todo].min(), ys[todo].max() + 1, xs[todo].max() + 1)
+        if ys is None:
+            continue
+
+        prior = alpha[ys, xs].astype(np.float32) / 255.0
+        colour = rgb[ys, xs].astype(np.float32)
+        valid = (fg_sums[:, 3] > 0) & (bg_sums[:, 3] > 0)
+
+        f = fg_sums[:, :3] / np.maximum(fg_sums[:, 3:], 1)
+        b = bg_sums[:, :3] / np.maximum(bg_sums[:, 3:], 1)
+        d = f - b
+        dist2 = (d * d).sum(axis=1)
+        estimate = np.clip(((colour - b) * d).sum(axis=1) / np.maximum(dist2, 1e-6), 0.0, 1.0)
+
+        # Blend towards the network's mask where F and B are hard to tell apart
+        weight = np.where(valid, np.clip(dist2 / MIN_CONTRAST ** 2, 0.0, 1.0), 0.0)
+        new_alpha = weight * estimate + (1.0 - weight) * prior
+
+        # Un-mix the background: I = a*F + (1-a)*B  =>  F = B + (I - B) / a
+        unmixed = b + (colour - b) / np.maximum(new_alpha, 0.05)[:, None]
+        new_colour = np.where((weight > 0)[:, None], np.clip(unmixed, 0, 255), colour)
+
+        updates.append((ys, xs, new_alpha, new_colour))
+
+    # Write the band back in one go
+    for ys, xs, new_alpha, new_colour in updates:
+        alpha[ys, xs] = (new_alpha * 255.0 + 0.5).astype(np.uint8)
+        rgb[ys, xs] = (new_colour + 0.5).astype(np.uint8)
+
+    out = np.empty(alpha.shape + (4,), dtype=np.uint8)
+    out[..., :3] = rgb
+    out[..., 3] = alpha
+    return Image.fromarray(out)
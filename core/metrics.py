@@ -0,0 +1,344 @@
+"""
+Minimal Prometheus-style metrics (no external dependency).
+
+A process-wide REGISTRY holds counters, gauges and histograms; the removal
+engine, watch mode and batch mode record into it. The registry renders to
+the Prometheus text exposition format, which can be written to a file for
+node_exporter's textfile collector (TextfileExporter) or served over HTTP
+(serve_http) for scraping.
+
+    from core.metrics import REGISTRY
+    images = REGISTRY.counter("bgremover_images_total", "Images processed", ["status"])
+    images.labels(status="done").inc()
+"""
+import bisect
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+# Seconds; covers lite models on a desktop up to large models on phones
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, **labels):
+        """The child series for these label values."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels; use .labels(...)")
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+        self.function = None
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        with self._lock:
+            self.value = float(value)
+
+    def set_function(self, function):
+        """Reads the value from function() at render time."""
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            return float(self.function())
+        return self.value
+
+    def render(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.get())}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        if amount < 0:
+            raise ValueError("Counters only go up")
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount=1.0):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # Counts per bucket; cumulated when rendering
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if i < len(self.counts):
+                self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            labels = _format_labels(labelnames, key, [("le", _format_value(bound))])
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, key, [("le", "+Inf")])
+        lines.append(f"{name}_bucket{labels} {count}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {count}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class Registry:
+    """Named metrics; asking for an existing name returns the same metric."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._get(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self):
+        """The whole registry in the Prometheus text format."""
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        lines = []
+        for _, metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def resident_memory_bytes(pids=()):
+    """
+    Current resident set size of this process (0 when unknown).
+
+    pids: worker processes (core.procpool) whose RSS is added; pids that
+        have exited count as 0.
+    """
+    try:
+        import psutil
+        total = psutil.Process().memory_info().rss
+        for pid in pids:
+            try:
+                total += psutil.Process(pid).memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return total
+    except ImportError:
+        pass
+    try:
+        total = 0
+        for pid in ["self", *pids]:
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            except FileNotFoundError:
+                if pid == "self":
+                    raise
+        return total
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # Peak rather than current, but better than nothing (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if pids:
+            peak += resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return 0
+
+
+REGISTRY.gauge("process_resident_memory_bytes", "Resident memory size in bytes.").set_function(
+    resident_memory_bytes)
+
+
+def write_textfile(path, registry=REGISTRY):
+    """Writes the registry to path atomically (textfile collector friendly)."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+
+class TextfileExporter:
+    """Rewrites a metrics file every interval seconds on a daemon thread."""
+    def __init__(self, path, interval=15.0, registry=REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-textfile", daemon=True)
+
+    def _run(self):
+        while True:
+            try:
+                write_textfile(self.path, self.registry)
+            except OSError as e:
+                log.warning("Could not write metrics to %s: %s", self.path, e)
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops and writes the final values."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        write_textfile(self.path, self.registry)
+
+
+def serve_http(port, address="127.0.0.1", registry=REGISTRY):
+    """
+    Serves the registry at http://address:port/metrics on a daemon thread.
+    Returns the server; call shutdown() to stop it.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes every few seconds would flood the log
+
+    server = ThreadingHTTPServer((address, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    log.info("Serving metrics on http://%s:%d/metrics", address, server.server_address[1])
+    return server
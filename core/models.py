@@ -0,0 +1,199 @@
+"""
+Model registry and latency-budget model selection.
+
+Each model lists where to fetch it, how its input is prepared and a quality
+rank. select_model() picks the best model / input resolution that fits a
+latency budget, using latencies measured on this machine (BenchmarkStore)
+and rough reference numbers until a model has been measured.
+"""
+import copy
+import json
+import os
+import platform
+import threading
+import time
+
+from core.preprocess import IMAGENET_MEAN, IMAGENET_STD
+
+RELEASE_URL = "https://github.com/danielgatis/rembg/releases/download/v0.0.0/"
+
+
+class ModelSpec:
+    """
+    name: rembg model name (also the file stem).
+    input_size: native square input side.
+    tier: "lite" or "full".
+    quality: relative mask quality rank, 0-1 (higher is better).
+    reference_ms: rough single-image latency at input_size on a 4-core x86
+        desktop CPU. Only used until the model has been measured here.
+    """
+    def __init__(self, name, checksum, input_size, tier, quality, reference_ms, size_mb,
+                 mean=IMAGENET_MEAN, std=IMAGENET_STD):
+        self.name = name
+        self.url = RELEASE_URL + f"{name}.onnx"
+        self.filename = f"{name}.onnx"
+        self.checksum = checksum
+        self.input_size = input_size
+        self.tier = tier
+        self.quality = quality
+        self.reference_ms = reference_ms
+        self.size_mb = size_mb
+        self.mean = mean
+        self.std = std
+
+    def with_source(self, url=None, checksum=None, filename=None):
+        """
+        Copy of this spec fetched from elsewhere: a mirror, or a local HTTP
+        stand-in server in tests. filename is relative to the model folder.
+        """
+        spec = copy.copy(self)
+        spec.url = url or self.url
+        spec.checksum = checksum or self.checksum
+        spec.filename = filename or self.filename
+        return spec
+
+    def resolutions(self):
+        """Native input side plus two cheaper ones (multiples of 32)."""
+        sizes = [self.input_size, self.input_size * 3 // 4, self.input_size // 2]
+        return [max(32, s // 32 * 32) for s in sizes]
+
+    def __repr__(self):
+        return f"ModelSpec({self.name!r}, {self.tier}, {self.input_size}px)"
+
+
+# Checksums are the ones rembg publishes for its release files. Upstream only
+# publishes md5, and a digest we computed ourselves would only vouch for
+# whatever file we happened to download; pin a SHA-256 of your own copy with
+# ModelSpec.with_source(checksum="sha256:...") when serving from a mirror.
+MODELS = {
+    "u2netp": ModelSpec("u2netp", "md5:8e83ca70e441ab06c318d82300c84806",
+                        320, "lite", 0.60, 60, 4.7),
+    "silueta": ModelSpec("silueta", "md5:55e59e0d8062d2f5d013f4725ee84782",
+                         320, "lite", 0.75, 250, 43),
+    "u2net": ModelSpec("u2net", "md5:60024c5c889badc19c04ad937298a77b",
+                       320, "full", 0.80, 350, 168),
+    "isnet-general-use": ModelSpec("isnet-general-use", "md5:fc16ebd8b0c10d971d3513d564d01e29",
+                                   1024, "full", 0.95, 1500, 170,
+                                   mean=(0.5, 0.5, 0.5), std=(1.0, 1.0, 1.0)),
+}
+
+# ARM phones/boards run the same graph several times slower than the reference
+ARM_SLOWDOWN = 4.0
+
+
+def get_spec(name):
+    try:
+        return MODELS[name]
+    except KeyError:
+        raise ValueError(f"Unknown model: {name}") from None
+
+
+class BenchmarkStore:
+    """
+    Measured inference latency per (model, input size), smoothed with an EMA
+    and persisted as JSON. Writes are throttled so batch runs don't rewrite
+    the file for every image.
+    """
+    def __init__(self, path=None, alpha=0.3, save_interval=10.0):
+        self.path = path
+        self.alpha = alpha
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+        self._data = {}
+        if path:
+            try:
+                with open(path) as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                self._data = {}
+
+    @staticmethod
+    def _key(name, size):
+        return f"{name}@{size}"
+
+    def get(self, name, size):
+        return self._data.get(self._key(name, size))
+
+    def is_fixed_input(self, name):
+        return name in self._data.get("_fixed_input", [])
+
+    def mark_fixed_input(self, name):
+        """Remembers that a model only accepts its native input size."""
+        with self._lock:
+            fixed = self._data.setdefault("_fixed_input", [])
+            if name not in fixed:
+                fixed.append(name)
+
+    def record(self, name, size, ms):
+        key = self._key(name, size)
+        with self._lock:
+            old = self._data.get(key)
+            self._data[key] = ms if old is None else old + self.alpha * (ms - old)
+            if self.path and time.monotonic() - self._last_save >= self.save_interval:
+                self._save()
+
+    def _save(self):
+        self._last_save = time.monotonic()
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self._data, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def flush(self):
+        if self.path:
+            with self._lock:
+                self._save()
+
+
+def estimate_ms(spec, size, store=None):
+    """Measured latency if known, else the reference scaled by pixel count."""
+    measured = store.get(spec.name, size) if store else None
+    if measured is not None:
+        return measured
+    native = store.get(spec.name, spec.input_size) if store else None
+    base = native if native is not None else spec.reference_ms
+    if native is None and platform.machine().lower().startswith(("arm", "aarch64")):
+        base *= ARM_SLOWDOWN
+    return base * (size / spec.input_size) ** 2
+
+
+def quality_at(spec, size):
+    # Lower input resolution costs some edge quality, but less than a smaller model
+    return spec.quality * (0.7 + 0.3 * size / spec.input_size)
+
+
+def supports_input_size(session, size):
+    """True if the ONNX session accepts a size x size input (dynamic spatial dims)."""
+    shape = session.get_inputs()[0].shape
+    return all(not isinstance(d, int) or d == size for d in shape[2:])
+
+
+def select_model(budget_ms, prefer_quality=False, candidates=None, store=None, quality_slack=1.5):
+    """
+    Picks (ModelSpec, input_size) for a latency budget in milliseconds.
+
+    The highest-quality option whose estimated latency fits is returned.
+    With prefer_quality, options up to quality_slack x the budget count as
+    fitting, and when nothing fits the best-quality model is used anyway;
+    otherwise the fastest option is the fallback.
+    """
+    specs = [get_spec(name) for name in candidates] if candidates else list(MODELS.values())
+    options = []
+    for spec in specs:
+        fixed = store is not None and store.is_fixed_input(spec.name)
+        for size in [spec.input_size] if fixed else spec.resolutions():
+            options.append((spec, size, estimate_ms(spec, size, store)))
+
+    limit = budget_ms * (quality_slack if prefer_quality else 1.0)
+    fitting = [o for o in options if o[2] <= limit]
+    if fitting:
+        spec, size, _ = max(fitting, key=lambda o: (quality_at(o[0], o[1]), -o[2]))
+    elif prefer_quality:
+        spec, size, _ = max(options, key=lambda o: (quality_at(o[0], o[1]), -o[2]))
+    else:
+        spec, size, _ = min(options, key=lambda o: o[2])
+    return spec, size
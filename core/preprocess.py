@@ -0,0 +1,66 @@
+"""
+Model input preprocessing shared by the desktop and mobile removers.
+
+Builds the (1, 3, H, W) float32 tensor the segmentation models expect
+directly from a uint8 RGB image. The tensor is written into a buffer that is
+reused between calls, and (x / scale - mean) / std is folded into one
+multiply and one add per channel.
+"""
+import threading
+
+import numpy as np
+from PIL import Image
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+class Preprocessor:
+    """
+    size: model input (width, height).
+    normalize_max: divide by the image maximum instead of 255 (what rembg does).
+    reducing_gap: passed to PIL resize; box-reduces big images first.
+
+    Buffers are per thread, so one Preprocessor can serve several workers.
+    """
+    def __init__(self, size, mean=IMAGENET_MEAN, std=IMAGENET_STD,
+                 resample=Image.Resampling.BILINEAR, normalize_max=False, reducing_gap=None):
+        self.size = tuple(size)
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.std = np.asarray(std, dtype=np.float32)
+        self.resample = resample
+        self.normalize_max = normalize_max
+        self.reducing_gap = reducing_gap
+        self._local = threading.local()
+
+    def _tensor(self):
+        tensor = getattr(self._local, "tensor", None)
+        if tensor is None:
+            width, height = self.size
+            tensor = np.empty((1, 3, height, width), dtype=np.float32)
+            self._local.tensor = tensor
+        return tensor
+
+    def __call__(self, img: Image.Image) -> np.ndarray:
+        """
+        Returns the input tensor for img. The array is overwritten by the next
+        call on the same thread, so run the model before preprocessing again.
+        """
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if img.size != self.size:
+            img = img.resize(self.size, self.resample, reducing_gap=self.reducing_gap)
+        pixels = np.asarray(img)
+
+        divisor = np.float32(255.0)
+        if self.normalize_max:
+            divisor = np.float32(max(int(pixels.max()), 1))
+        scale = (1.0 / (divisor * self.std)).astype(np.float32)
+        offset = (-self.mean / self.std).astype(np.float32)
+
+        tensor = self._tensor()
+        for c in range(3):
+            plane = tensor[0, c]
+            np.multiply(pixels[..., c], scale[c], out=plane)
+            plane += offset[c]
+        return tensor
@@ -0,0 +1,170 @@
+"""
+Background removal in a pool of worker processes.
+
+Threads share one interpreter, so the Python parts of the pipeline (mask
+clean-up, matting, PIL conversions) serialise on the GIL however many
+workers a batch has. ProcessRemover runs BgRemover in separate processes
+instead, moving pixels through a core.shm ring: each call costs a Slot
+descriptor over the pipe, not pickled images.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from PIL import Image
+
+from core.engine import upright
+from core.remover import IN_PROGRESS, REQUEST_SECONDS, REQUESTS
+from core.shm import ShmRing, array_view
+from core.threads import available_cores
+
+log = logging.getLogger(__name__)
+
+# Default ring size: a few 12MP images (RGB in, RGBA out) in flight
+DEFAULT_RING_BYTES = 512 << 20
+# How long start-up waits for every worker to load its model
+STARTUP_TIMEOUT = 600
+
+# Per-process state, set up by _init_worker
+_worker = {}
+
+
+def _init_worker(shm_name, model_name, input_size, threads, ready):
+    from core.remover import BgRemover
+
+    _worker["shm"] = shared_memory.SharedMemory(name=shm_name)
+    _worker["remover"] = BgRemover(model_name, threads=threads, input_size=input_size)
+    ready.put(os.getpid())
+
+
+def _remove_in_place(offset, shape, kwargs):
+    """
+    Worker side: reads the (h, w, c) image at offset in the ring and writes
+    its (h, w, 4) cutout right after it.
+    """
+    buf = _worker["shm"].buf
+    pixels = array_view(buf, offset, shape)
+    # Copy: PIL may keep the buffer alive past this call otherwise
+    img = Image.fromarray(pixels.copy())
+    del pixels
+
+    result = _worker["remover"].process_image(img, **kwargs)
+    if result.size != img.size:
+        raise ValueError(f"cutout is {result.size}, expected {img.size}")
+    out = array_view(buf, offset + int(np.prod(shape)), (shape[0], shape[1], 4))
+    out[...] = np.asarray(result.convert("RGBA"))
+    del out
+
+
+def _remove_pickled(img, kwargs):
+    """Worker side fallback for images larger than the ring."""
+    return _worker["remover"].process_image(img, **kwargs)
+
+
+class ProcessRemover:
+    """
+    Drop-in for BgRemover.process_image() that runs in `processes` worker
+    processes, each with its own model session. Safe to call from many
+    threads; calls block while the ring is full.
+    """
+    def __init__(self, model_name="isnet-general-use", processes=2, input_size=None, threads=None,
+                 ring_bytes=DEFAULT_RING_BYTES):
+        """
+        threads: intra-op threads per process; default splits the usable cores.
+        ring_bytes: shared memory for images in flight. Larger images are
+            pickled instead.
+        """
+        self.current_model = model_name
+        self.processes = processes
+        threads = threads or max(1, available_cores() // processes)
+        self._ring = ShmRing(ring_bytes)
+        context = multiprocessing.get_context()
+        ready = context.Queue()
+        self._pool = ProcessPoolExecutor(
+            max_workers=processes, mp_context=context, initializer=_init_worker,
+            initargs=(self._ring.name, model_name, input_size, threads, ready),
+        )
+        try:
+            self.worker_pids = self._start_workers(ready)
+        except Exception:
+            self.close()
+            raise
+        log.info("%d removal processes, %d threads each, %d MB shared ring",
+                 processes, threads, self._ring.capacity >> 20)
+
+    def _start_workers(self, ready):
+        """
+        Starts every worker now and waits until each has loaded its model, so
+        the models' memory shows (see MemoryBudget.rebaseline) before the first
+        image. Returns the workers' pids.
+        """
+        # The pool only spawns processes for submitted work
+        starts = [self._pool.submit(os.getpid) for _ in range(self.processes)]
+        pids = []
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while len(pids) < self.processes:
+            try:
+                pids.append(ready.get(timeout=0.5))
+            except queue.Empty:
+                failed = [f for f in starts if f.done() and f.exception()]
+                if failed:
+                    raise failed[0].exception()
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"removal processes not ready after {STARTUP_TIMEOUT}s")
+        return pids
+
+    def process_image(self, input_image: Image.Image, alpha_matting=True, post_process=True,
+                      matting_mode="full", fast_paths=False, bbox=None) -> Image.Image:
+        """Same as BgRemover.process_image()."""
+        kwargs = {"alpha_matting": alpha_matting, "post_process": post_process,
+                  "matting_mode": matting_mode, "fast_paths": fast_paths, "bbox": bbox}
+        start = time.perf_counter()
+        IN_PROGRESS.inc()
+        try:
+            result = self._process(input_image, kwargs)
+        except Exception:
+            REQUESTS.labels(model=self.current_model, status="error").inc()
+            raise
+        finally:
+            IN_PROGRESS.dec()
+        REQUEST_SECONDS.labels(model=self.current_model).observe(time.perf_counter() - start)
+        REQUESTS.labels(model=self.current_model, status="ok").inc()
+        return result
+
+    def _process(self, input_image, kwargs):
+        # EXIF orientation does not survive the trip as raw pixels, apply it here
+        img = upright(input_image)
+        if img.mode not in ("RGB", "RGBA"):
+            # Keep transparency for the alpha fast path (core.fastpath)
+            transparent = img.mode in ("LA", "PA") or "transparency" in img.info
+            img = img.convert("RGBA" if transparent else "RGB")
+        pixels = np.asarray(img)
+        nbytes = pixels.nbytes + img.width * img.height * 4
+        if nbytes > self._ring.capacity:
+            log.debug("%dx%d image is larger than the shared ring, pickling it", *img.size)
+            return self._pool.submit(_remove_pickled, img, kwargs).result()
+
+        slot = self._ring.alloc(nbytes)
+        try:
+            view = array_view(self._ring.buf, slot.offset, pixels.shape)
+            view[...] = pixels
+            del view, pixels
+            self._pool.submit(_remove_in_place, slot.offset, (img.height, img.width, len(img.mode)),
+                              kwargs).result()
+            out = array_view(self._ring.buf, slot.offset + img.width * img.height * len(img.mode),
+                             (img.height, img.width, 4))
+            # The slot is reused once freed, so the result needs its own copy
+            result = Image.fromarray(out.copy())
+            del out
+        finally:
+            self._ring.free(slot)
+        return result
+
+    def close(self):
+        self._pool.shutdown()
+        self._ring.close()
@@ -0,0 +1,91 @@
+"""
+Mask refinement helpers for the interactive edge controls.
+
+Everything here works on uint8 NumPy arrays so the GUI can re-apply
+threshold / erode / feather to a cached soft mask without re-running the model.
+"""
+import numpy as np
+
+
+def _axis_slice(ndim, axis, sl):
+    index = [slice(None)] * ndim
+    index[axis] = sl
+    return tuple(index)
+
+
+def _box_blur_axis(arr, radius, axis):
+    # Running-sum box filter, cost is independent of the radius
+    n = arr.shape[axis]
+    size = 2 * radius + 1
+    pad = [(0, 0)] * arr.ndim
+    pad[axis] = (radius + 1, radius)
+    csum = np.cumsum(np.pad(arr, pad, mode="edge"), axis=axis, dtype=np.float32)
+    upper = csum[_axis_slice(arr.ndim, axis, slice(size, size + n))]
+    lower = csum[_axis_slice(arr.ndim, axis, slice(0, n))]
+    return (upper - lower) / size
+
+
+def box_blur(arr, radius):
+    """Separable box blur of a 2D array. Returns float32."""
+    out = arr.astype(np.float32)
+    if radius < 1:
+        return out
+    out = _box_blur_axis(out, radius, 0)
+    return _box_blur_axis(out, radius, 1)
+
+
+def _rank_filter_axis(arr, radius, axis, op):
+    n = arr.shape[axis]
+    pad = [(0, 0)] * arr.ndim
+    pad[axis] = (radius, radius)
+    padded = np.pad(arr, pad, mode="edge")
+    out = padded[_axis_slice(arr.ndim, axis, slice(0, n))].copy()
+    for k in range(1, 2 * radius + 1):
+        op(out, padded[_axis_slice(arr.ndim, axis, slice(k, k + n))], out=out)
+    return out
+
+
+def erode_mask(mask, radius):
+    """
+    Shrinks (radius > 0) or grows (radius < 0) the mask with a square
+    min/max filter.
+    """
+    if radius == 0:
+        return mask
+    op = np.minimum if radius > 0 else np.maximum
+    radius = abs(radius)
+    out = _rank_filter_axis(mask, radius, 0, op)
+    return _rank_filter_axis(out, radius, 1, op)
+
+
+def feather_mask(mask, radius):
+    """Softens mask edges with three box passes (close to a Gaussian)."""
+    if radius < 1:
+        return mask
+    step = max(1, radius // 3)
+    out = mask.astype(np.float32)
+    for _ in range(3):
+        out = box_blur(out, step)
+    return np.clip(out + 0.5, 0, 255).astype(np.uint8)
+
+
+def refine_mask(mask, threshold=0, erode=0, feather=0):
+    """
+    Applies the edge controls to a uint8 soft mask, in this order:
+    threshold (0 keeps the soft mask), erode/grow, feather.
+    """
+    out = mask
+    if threshold > 0:
+        out = np.where(out >= threshold, 255, 0).astype(np.uint8)
+    out = erode_mask(out, int(erode))
+    return feather_mask(out, int(feather))
+
+
+def compose_rgba(rgb, alpha, out=None):
+    """Stacks an HxWx3 colour array and an HxW alpha into an HxWx4 uint8 array."""
+    h, w = alpha.shape
+    if out is None or out.shape != (h, w, 4):
+        out = np.empty((h, w, 4), dtype=np.uint8)
+    out[..., :3] = rgb
+    out[..., 3] = alpha
+    return out
@@ -1,24 +1,281 @@
-from rembg import remove, new_session
 from PIL import Image
+import numpy as np
 import io
+import logging
+import os
+import threading
+import time
+
+from core.engine import Engine, create_session, padded_box, upright
+from core.fastpath import MODEL, fast_cutout
+from core.matting import refine_band
+from core.metrics import REGISTRY
+from core.models import MODELS, BenchmarkStore, select_model
+from core.preprocess import Preprocessor
+from core.threads import calibrate, default_thread_count, load_cached, store_cached
+
+log = logging.getLogger(__name__)
+
+# rembg pulls in onnxruntime, numba-backed matting, scipy etc. (seconds of
+# import time), so it is only imported on first use or from preload().
+# Models in core.models run on the lighter shared engine instead.
+
+# Alpha matting: foreground threshold, background threshold, erode size
+ALPHA_MATTING_SETTINGS = (240, 10, 10)
+# "full": pymatting over the whole image (rembg); "band": only the uncertain
+# band around the outline is refined (core.matting), cost follows the perimeter
+MATTING_MODES = ("full", "band")
+
+REQUESTS = REGISTRY.counter("bgremover_requests_total", "Background removals by model and outcome.",
+                            ["model", "status"])
+REQUEST_SECONDS = REGISTRY.histogram("bgremover_request_seconds", "End-to-end removal time.", ["model"])
+IN_PROGRESS = REGISTRY.gauge("bgremover_requests_in_progress", "Removals currently running.")
+MODEL_LOADS = REGISTRY.histogram("bgremover_model_load_seconds", "Model (session) load time.", ["model"])
+MODEL_CACHE = REGISTRY.counter("bgremover_model_cache_total",
+                               "Requests served by the loaded model (hit) or after a reload (miss).",
+                               ["result"])
+FAST_PATHS = REGISTRY.counter("bgremover_fast_path_total",
+                              "Images by path with fast paths on: passed-through alpha, flat "
+                              "backdrop, or the model.", ["path"])
+
+def model_home():
+    """Where rembg keeps its models."""
+    return os.path.expanduser(os.getenv("U2NET_HOME", os.path.join("~", ".u2net")))
+
+_benchmarks = None
+
+def benchmark_store():
+    """Latencies measured on this machine, used for latency-budget model selection."""
+    global _benchmarks
+    if _benchmarks is None:
+        os.makedirs(model_home(), exist_ok=True)
+        _benchmarks = BenchmarkStore(os.path.join(model_home(), "benchmarks.json"))
+    return _benchmarks
+
+def resolve_model(model_name, latency_budget_ms=1000, prefer_quality=False):
+    """
+    Maps "auto" to the (model name, input size) that fits the latency budget
+    on this machine. Other names pass through with their native input size.
+    """
+    if model_name != "auto":
+        return model_name, None
+    spec, size = select_model(latency_budget_ms, prefer_quality=prefer_quality, store=benchmark_store())
+    return spec.name, (size if size != spec.input_size else None)
+
+def _stock_rembg_normalize(session):
+    """
+    True when session's normalize() is rembg's BaseSession.normalize with the
+    (img, mean, std, size, *args, **kwargs) signature _install_preprocessor replaces.
+    """
+    import inspect
+
+    try:
+        from rembg.sessions.base import BaseSession
+    except ImportError:
+        return False
+    if not hasattr(session, "inner_session") or type(session).normalize is not BaseSession.normalize:
+        return False
+    params = list(inspect.signature(BaseSession.normalize).parameters.values())
+    names = [p.name for p in params[:5]]
+    kinds = {p.kind for p in params[5:]}
+    return names == ["self", "img", "mean", "std", "size"] and kinds <= {
+        inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD}
+
+def new_cpu_session(model_name, threads=None):
+    """
+    rembg session on the CPU provider. With threads set, ONNX Runtime is limited
+    to that many intra-op threads (rembg's new_session has no option for it).
+    """
+    from rembg import new_session
+
+    if threads:
+        import onnxruntime as ort
+        from rembg.sessions import sessions_class
+
+        for session_class in sessions_class:
+            if session_class.name() == model_name:
+                sess_opts = ort.SessionOptions()
+                sess_opts.intra_op_num_threads = threads
+                sess_opts.inter_op_num_threads = 1
+                return session_class(model_name, sess_opts, providers=['CPUExecutionProvider'])
+    return new_session(model_name, providers=['CPUExecutionProvider'])
 
 class BgRemover:
-    def __init__(self, model_name="isnet-general-use"):
+    def __init__(self, model_name="isnet-general-use", threads="auto", input_size=None):
+        """
+        threads: intra-op thread count, or "auto" for the calibrated value if
+        calibrate_threads() has run on this machine, else ONNX Runtime's default
+        (physical cores), lowered only by affinity / cgroup limits.
+        input_size: square model input side, None for the model's native size.
+            Ignored for models with a fixed input shape.
+        """
+        self.threads = threads
+        self.input_size = input_size
         self.current_model = model_name
-        # Explicitly force CPU provider to avoid auto-detection errors
-        self.session = new_session(model_name, providers=['CPUExecutionProvider'])
+        self.engine = None
+        self.session = None
+        self._load_model()
+
+    def _load_model(self):
+        model_name = self.current_model
+        threads = None if self.threads == "auto" else self.threads
+        with MODEL_LOADS.labels(model=model_name).time():
+            self._load_session(model_name, threads)
+
+    def _load_session(self, model_name, threads):
+        if model_name in MODELS:
+            # Registry models run on the shared engine (same code as the mobile app)
+            self.engine = Engine.load(model_name, model_home(), input_size=self.input_size,
+                                      threads=threads, benchmarks=benchmark_store())
+            self.session = None
+        else:
+            # Specialised models (human / cloth segmentation) keep rembg's session
+            self.engine = None
+            # Explicitly force CPU provider to avoid auto-detection errors
+            self.session = new_cpu_session(model_name, threads or self._thread_count(model_name))
+            self._install_preprocessor()
+
+    def _model_path(self, model_name):
+        return os.path.join(model_home(), f"{model_name}.onnx")
+
+    def _thread_count(self, model_name):
+        cache_path = os.path.join(model_home(), "threads.json")
+        return load_cached(cache_path, self._model_path(model_name)) or default_thread_count()
+
+    def calibrate_threads(self):
+        """
+        Times a few thread counts for the current model, caches the fastest
+        and reloads the model with it. Returns the chosen count.
+        """
+        model_path = self._model_path(self.current_model)
+        threads, _ = calibrate(lambda n: create_session(model_path, n))
+        store_cached(os.path.join(model_home(), "threads.json"), model_path, threads)
+        self._load_model()
+        return threads
+
+    def _install_preprocessor(self):
+        """
+        Routes the session's input normalisation through the shared Preprocessor
+        (reused NCHW buffer, fused scale/offset) instead of rembg's chain of
+        float64 temporaries. Same maths: LANCZOS resize, divide by image max.
+
+        Only done while the session uses rembg's stock normalize() with the
+        (img, mean, std, size, ...) signature this stands in for, and the first
+        call per setting is checked against rembg's own output; on any mismatch
+        rembg's normalize keeps running.
+        """
+        session = self.session
+        if not _stock_rembg_normalize(session):
+            log.info("rembg session %s has its own normalize(), not replacing it", type(session).__name__)
+            return
+        input_name = session.inner_session.get_inputs()[0].name
+        stock_normalize = session.normalize
+        preprocessors = {}
+
+        def normalize(img, mean, std, size, *args, **kwargs):
+            key = (tuple(mean), tuple(std), tuple(size))
+            if key not in preprocessors:
+                preprocessor = Preprocessor(size, mean, std, resample=Image.Resampling.LANCZOS,
+                                            normalize_max=True)
+                expected = stock_normalize(img, mean, std, size, *args, **kwargs)
+                if not np.allclose(preprocessor(img), expected[input_name], atol=1e-3):
+                    log.warning("Preprocessor differs from rembg's normalize(), using rembg's")
+                    preprocessor = None
+                preprocessors[key] = preprocessor
+                return expected
+            if preprocessors[key] is None:
+                return stock_normalize(img, mean, std, size, *args, **kwargs)
+            return {input_name: preprocessors[key](img)}
 
-    def change_model(self, model_name):
-        if model_name != self.current_model:
+        session.normalize = normalize
+
+    def change_model(self, model_name, input_size=None):
+        """Returns True when the model had to be (re)loaded."""
+        if model_name != self.current_model or input_size != self.input_size:
             self.current_model = model_name
-            # Re-initialize session with new model
-            self.session = new_session(model_name, providers=['CPUExecutionProvider'])
+            self.input_size = input_size
+            # Re-initialize with new model
+            self._load_model()
+            return True
+        return False
 
-    def process_image(self, input_image: Image.Image, alpha_matting=True, post_process=True) -> Image.Image:
+    def process_image(self, input_image: Image.Image, alpha_matting=True, post_process=True,
+                      matting_mode="full", fast_paths=False, bbox=None) -> Image.Image:
         """
         Removes the background from the given PIL Image.
+        matting_mode: "full" or "band", see MATTING_MODES.
+        fast_paths: skip the model for images that already have transparency
+            or sit on a flat backdrop, when core.fastpath is confident.
+        bbox: (left, top, right, bottom) around the subject, in pixels of the
+            upright image. Only a padded crop of it is processed, so small
+            subjects get the model's full resolution; the rest is transparent.
         Returns a RGBA Image with transparency.
         """
+        model = self.current_model
+        start = time.perf_counter()
+        IN_PROGRESS.inc()
+        try:
+            if bbox is not None:
+                result = self._process_region(input_image, bbox, alpha_matting, post_process,
+                                              matting_mode, fast_paths)
+            else:
+                result = self._process(input_image, alpha_matting, post_process, matting_mode, fast_paths)
+        except Exception:
+            REQUESTS.labels(model=model, status="error").inc()
+            raise
+        finally:
+            IN_PROGRESS.dec()
+        REQUEST_SECONDS.labels(model=model).observe(time.perf_counter() - start)
+        REQUESTS.labels(model=model, status="ok").inc()
+        return result
+
+    def _process(self, input_image, alpha_matting, post_process, matting_mode, fast_paths=False):
+        band = alpha_matting and matting_mode == "band"
+        if fast_paths:
+            input_image = upright(input_image)
+            result, decision = fast_cutout(input_image)
+            FAST_PATHS.labels(path=decision.kind if result is not None else MODEL).inc()
+            if result is not None:
+                return result
+
+        if self.engine is None:
+            if band:
+                return self._band_with_rembg(input_image, post_process)
+            return self._process_with_rembg(input_image, alpha_matting, post_process)
+
+        img = upright(input_image)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGB")
+        mask = self.engine.mask(img)
+
+        # Mask clean-up and matting still come from rembg (scipy / pymatting)
+        if post_process:
+            from rembg.bg import post_process as clean_mask
+            mask = Image.fromarray(clean_mask(np.array(mask)))
+
+        if band:
+            return refine_band(img, mask, *ALPHA_MATTING_SETTINGS)
+        if alpha_matting:
+            from rembg.bg import alpha_matting_cutout
+            try:
+                return alpha_matting_cutout(img, mask, *ALPHA_MATTING_SETTINGS)
+            except ValueError:
+                pass  # Matting can fail on degenerate trimaps, rembg falls back the same way
+
+        return self.engine.cutout(img, mask)
+
+    def _process_region(self, input_image, bbox, *options):
+        img = upright(input_image)
+        box = padded_box(bbox, img.size)
+        cutout = self._process(img.crop(box), *options)
+        # Paste the crop's cutout back; everything outside the region is background
+        result = Image.new("RGBA", img.size)
+        result.paste(cutout.convert("RGBA"), box[:2])
+        return result
+
+    def _process_with_rembg(self, input_image, alpha_matting, post_process):
+        from rembg import remove
+
         # rembg expects a PIL image or bytes. We'll pass the PIL image directly.
         
         # Base settings
@@ -29,23 +286,59 @@ class BgRemover:
         }
         
         if alpha_matting:
+            foreground, background, erode = ALPHA_MATTING_SETTINGS
             kwargs.update({
-                "alpha_matting_foreground_threshold": 240,
-                "alpha_matting_background_threshold": 10,
-                "alpha_matting_erode_size": 10
+                "alpha_matting_foreground_threshold": foreground,
+                "alpha_matting_background_threshold": background,
+                "alpha_matting_erode_size": erode
             })
             
         return remove(input_image, **kwargs)
 
+    def _band_with_rembg(self, input_image, post_process):
+        from rembg import remove
+
+        img = upright(input_image)
+        mask = remove(img, session=self.session, only_mask=True, post_process_mask=post_process)
+        return refine_band(img, mask, *ALPHA_MATTING_SETTINGS)
+
 # Global instance or standalone usage
 _remover = None
+_remover_lock = threading.Lock()
 
-def remove_background(image: Image.Image, model_name="isnet-general-use", alpha_matting=True, post_process=True) -> Image.Image:
+def _get_remover(model_name, input_size=None):
     global _remover
-    if _remover is None:
-        _remover = BgRemover(model_name)
-    else:
-        # Check if model needs changing
-        _remover.change_model(model_name)
-        
-    return _remover.process_image(image, alpha_matting=alpha_matting, post_process=post_process)
+    with _remover_lock:
+        if _remover is None:
+            _remover = BgRemover(model_name, input_size=input_size)
+            reloaded = True
+        else:
+            # Check if model needs changing
+            reloaded = _remover.change_model(model_name, input_size)
+        MODEL_CACHE.labels(result="miss" if reloaded else "hit").inc()
+        return _remover
+
+def preload(model_name=None):
+    """
+    Imports the ML stack (and optionally loads a model session) ahead of time.
+    Meant to run on a background thread once the window is visible.
+    """
+    import onnxruntime  # noqa: F401
+    import rembg  # noqa: F401
+    if model_name:
+        _get_remover(model_name)
+
+def remove_background(image: Image.Image, model_name="isnet-general-use", alpha_matting=True, post_process=True,
+                      latency_budget_ms=1000, prefer_quality=False, matting_mode="full",
+                      fast_paths=False, bbox=None) -> Image.Image:
+    """
+    model_name="auto" picks the model and input resolution that fit
+    latency_budget_ms on this machine (see core.models.select_model).
+    matting_mode="band" refines only the edge band instead of the whole image.
+    fast_paths=True skips the model where core.fastpath can cut out the image alone.
+    bbox=(left, top, right, bottom) runs the model only on that region (padded).
+    """
+    model_name, input_size = resolve_model(model_name, latency_budget_ms, prefer_quality)
+    return _get_remover(model_name, input_size).process_image(image, alpha_matting=alpha_matting, post_process=post_process,
+                                                              matting_mode=matting_mode, fast_paths=fast_paths,
+                                                              bbox=bbox)
@@ -0,0 +1,306 @@
+"""
+Coordinator-free work sharding over a shared folder.
+
+Several machines work through one backfill by pulling jobs from a queue
+folder on a shared filesystem (SMB / NFS); there is no server. A job is
+claimed with an atomic rename, so exactly one worker gets it, and held with
+a lease: the worker keeps touching the claimed file, and a claim whose file
+has not been touched for lease_seconds (crashed or unplugged node) goes back
+to the queue. Results land in done/ and are merged into one JobManifest.
+
+    <queue>/queue.json                     settings every worker uses
+    <queue>/todo/<id>~<attempt>.job        waiting (JSON: input, outputs)
+    <queue>/claimed/<name>@<worker>        being processed; mtime = lease heartbeat
+    <queue>/done/<id>.json                 result: status, timing, error, worker
+
+Input and output paths are stored as given, so every node must see the
+shared folders under the same paths.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import socket
+import threading
+import time
+
+from core.batch import BatchRunner
+from core.jobs import DONE, FAILED, JobManifest
+
+log = logging.getLogger(__name__)
+
+CONFIG_NAME = "queue.json"
+JOB_SUFFIX = ".job"
+
+
+def job_id(path):
+    return hashlib.sha1(path.encode("utf-8")).hexdigest()[:20]
+
+
+def default_worker_id():
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", f"{socket.gethostname()}-{os.getpid()}")
+
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    """Atomic write: readers on other nodes never see half a file."""
+    tmp_path = f"{path}.{default_worker_id()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class Claim:
+    def __init__(self, path, job):
+        self.path = path
+        self.job = job
+
+
+class ShardQueue:
+    def __init__(self, directory, lease_seconds=600, max_attempts=3):
+        """
+        lease_seconds: a claim not renewed for this long is handed to another worker.
+        max_attempts: claims that expire this many times are recorded as failed
+            (an image that keeps crashing workers).
+        """
+        self.directory = directory
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.todo_dir = os.path.join(directory, "todo")
+        self.claimed_dir = os.path.join(directory, "claimed")
+        self.done_dir = os.path.join(directory, "done")
+        for path in (self.todo_dir, self.claimed_dir, self.done_dir):
+            os.makedirs(path, exist_ok=True)
+        self._candidates = []
+
+    @property
+    def config(self):
+        """Settings stored by enqueue(); {} when none."""
+        path = os.path.join(self.directory, CONFIG_NAME)
+        return _read_json(path) if os.path.exists(path) else {}
+
+    def enqueue(self, jobs, config=None):
+        """
+        Adds (input, outputs, size, mtime) jobs; inputs already queued, being
+        processed or done with an unchanged file are skipped. config is saved
+        for the workers. Returns the number of jobs added.
+        """
+        if config is not None:
+            _write_json(os.path.join(self.directory, CONFIG_NAME), config)
+
+        queued = {name.split("~")[0] for name in os.listdir(self.todo_dir)}
+        queued |= {name.split("~")[0] for name in os.listdir(self.claimed_dir)}
+        done = {name[:-len(".json")] for name in os.listdir(self.done_dir) if name.endswith(".json")}
+
+        added = 0
+        for path, outputs, size, mtime in jobs:
+            key = job_id(path)
+            if key in queued:
+                continue
+            if key in done:
+                result = _read_json(os.path.join(self.done_dir, key + ".json"))
+                if (result.get("size"), result.get("mtime")) == (size, mtime):
+                    continue
+                os.remove(os.path.join(self.done_dir, key + ".json"))  # Changed since, redo
+            job = {"input": path, "outputs": outputs, "size": size, "mtime": mtime}
+            _write_json(os.path.join(self.todo_dir, f"{key}~0{JOB_SUFFIX}"), job)
+            added += 1
+        return added
+
+    def now(self):
+        """
+        Current time on the file server: leases are compared with mtimes the
+        server sets, so node clocks do not need to agree.
+        """
+        clock_dir = os.path.join(self.directory, ".clock")
+        os.makedirs(clock_dir, exist_ok=True)
+        path = os.path.join(clock_dir, f"{default_worker_id()}-{threading.get_ident()}")
+        with open(path, "a"):
+            pass
+        os.utime(path)
+        return os.stat(path).st_mtime
+
+    def claim(self, worker_id):
+        """Takes one job for worker_id; None when the queue is empty."""
+        for _ in range(2):
+            while self._candidates:
+                name = self._candidates.pop()
+                target = os.path.join(self.claimed_dir, f"{name}@{worker_id}")
+                try:
+                    os.rename(os.path.join(self.todo_dir, name), target)
+                except FileNotFoundError:
+                    continue  # Another worker was faster
+                if os.path.exists(os.path.join(self.done_dir, name.split("~")[0] + ".json")):
+                    # Re-queued when a lease expired, but that worker finished it after all
+                    os.remove(target)
+                    continue
+                os.utime(target)  # The lease starts now, rename keeps the old mtime
+                return Claim(target, _read_json(target))
+            # Re-list; random order keeps workers from all fighting over the same files
+            self._candidates = [n for n in os.listdir(self.todo_dir) if n.endswith(JOB_SUFFIX)]
+            random.shuffle(self._candidates)
+        return None
+
+    def renew(self, claims):
+        """Heartbeat: extends the leases of claims still held."""
+        for claim in claims:
+            try:
+                os.utime(claim.path)
+            except FileNotFoundError:
+                log.warning("Lease on %s was lost", claim.job["input"])
+
+    def reclaim_expired(self):
+        """Puts claims whose lease ran out back in the queue. Returns how many."""
+        now = self.now()
+        reclaimed = 0
+        for name in os.listdir(self.claimed_dir):
+            path = os.path.join(self.claimed_dir, name)
+            try:
+                if now - os.stat(path).st_mtime < self.lease_seconds:
+                    continue
+            except FileNotFoundError:
+                continue
+            job_name, _, worker = name.rpartition("@")
+            key, _, attempt = job_name[:-len(JOB_SUFFIX)].partition("~")
+            attempt = int(attempt or 0) + 1
+            if attempt >= self.max_attempts:
+                try:
+                    job = _read_json(path)
+                except FileNotFoundError:
+                    continue
+                self._write_result(key, job, FAILED, None,
+                                   f"lease expired {attempt} times (last worker: {worker})", worker)
+                target = path
+            else:
+                target = os.path.join(self.todo_dir, f"{key}~{attempt}{JOB_SUFFIX}")
+            try:
+                if target == path:
+                    os.remove(path)
+                else:
+                    os.rename(path, target)
+            except FileNotFoundError:
+                continue  # Reclaimed by someone else, or finished after all
+            log.warning("Lease of %s expired, %s", worker, "giving up" if target == path else "re-queued")
+            reclaimed += 1
+        return reclaimed
+
+    def _write_result(self, key, job, status, elapsed_ms, error, worker_id):
+        result = dict(job, status=status, elapsed_ms=elapsed_ms, error=error, worker=worker_id,
+                      finished=time.time())
+        _write_json(os.path.join(self.done_dir, key + ".json"), result)
+
+    def complete(self, claim, status, elapsed_ms, error, worker_id):
+        """Records the result of a claimed job and releases the claim."""
+        self._write_result(job_id(claim.job["input"]), claim.job, status, elapsed_ms, error, worker_id)
+        try:
+            os.remove(claim.path)
+        except FileNotFoundError:
+            pass  # Lease expired meanwhile; claim() drops the re-queued copy since the result is in done/
+
+    def has_claims(self):
+        return any(name for name in os.listdir(self.claimed_dir) if "@" in name)
+
+    def results(self):
+        for name in os.listdir(self.done_dir):
+            if name.endswith(".json"):
+                try:
+                    yield _read_json(os.path.join(self.done_dir, name))
+                except (FileNotFoundError, ValueError):
+                    continue  # Being replaced right now
+
+    def counts(self):
+        counts = {
+            "todo": sum(1 for n in os.listdir(self.todo_dir) if n.endswith(JOB_SUFFIX)),
+            "claimed": sum(1 for n in os.listdir(self.claimed_dir) if "@" in n),
+        }
+        for result in self.results():
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        return counts
+
+    def merge(self, manifest_path):
+        """Copies every result into a JobManifest; returns its status counts."""
+        results = list(self.results())
+        with JobManifest(manifest_path) as manifest:
+            manifest.add((r["input"], r["outputs"], r["size"], r["mtime"]) for r in results)
+            for r in results:
+                if r["status"] == DONE:
+                    manifest.mark_done(r["input"], r["elapsed_ms"])
+                else:
+                    manifest.mark_failed(r["input"], r["error"], r["elapsed_ms"])
+        with JobManifest(manifest_path) as manifest:
+            return manifest.counts()
+
+
+class ShardWorker(BatchRunner):
+    """
+    Processes jobs from a ShardQueue until it is empty. Removal settings come
+    from the queue's config so all nodes produce the same outputs.
+    """
+    metrics_mode = "shard"
+
+    def __init__(self, queue, worker_id=None, wait=False, poll_interval=10.0, **kwargs):
+        """
+        wait: when the queue is empty, keep going until every claim (also
+            those of other workers) is finished, picking up expired leases.
+        kwargs: BatchRunner settings (workers, memory_budget, ...).
+        """
+        super().__init__([], queue.directory, **kwargs)
+        self.queue = queue
+        self.worker_id = worker_id or default_worker_id()
+        self.wait = wait
+        self.poll_interval = poll_interval
+        self._claims = {}
+
+    def _claimed_jobs(self):
+        while not self._stop.is_set():
+            claim = self.queue.claim(self.worker_id)
+            if claim is None:
+                if self.queue.reclaim_expired():
+                    continue
+                if self.wait and self.queue.has_claims():
+                    self._stop.wait(self.poll_interval)
+                    continue
+                return
+            with self._lock:
+                self._claims[claim.job["input"]] = claim
+            yield claim.job["input"], claim.job["outputs"]
+
+    def _heartbeat(self, stop):
+        while not stop.wait(self.queue.lease_seconds / 3):
+            with self._lock:
+                claims = list(self._claims.values())
+            self.queue.renew(claims)
+
+    # BatchRunner reports results through self._manifest; here they go to the queue
+    def mark_done(self, path, elapsed_ms):
+        with self._lock:
+            claim = self._claims.pop(path)
+        self.queue.complete(claim, DONE, elapsed_ms, None, self.worker_id)
+
+    def mark_failed(self, path, error, elapsed_ms=None):
+        with self._lock:
+            claim = self._claims.pop(path)
+        self.queue.complete(claim, FAILED, elapsed_ms, str(error), self.worker_id)
+
+    def run(self):
+        """Works until the queue is drained. Returns the queue's counts."""
+        self._open_remover()
+        self._manifest = self
+
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(stop_heartbeat,), daemon=True)
+        heartbeat.start()
+        log.info("Worker %s on %s", self.worker_id, self.queue.directory)
+        try:
+            self._run_jobs(self._claimed_jobs(), self.metrics_mode)
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+            self._close_remover()
+        return self.queue.counts()
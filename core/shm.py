@@ -0,0 +1,121 @@
+"""
+Shared-memory transport of pixels between processes.
+
+Sending a decoded photo to a worker process and its RGBA cutout back through
+a pipe pickles both, several full-frame copies per image. Instead the parent
+owns one multiprocessing.shared_memory segment carved up by a ring allocator:
+it copies the decoded pixels into a slot, the worker reads them and writes
+the cutout into the same slot's output half in place, and only a few-byte
+Slot descriptor crosses the pipe.
+
+Slots are handed out in order from the head of the ring and freed in any
+order; space is reclaimed from the tail once every older slot is freed too.
+Only the parent allocates, so the allocator needs no cross-process lock.
+"""
+import threading
+from collections import deque, namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Slots start on cache-line boundaries
+ALIGN = 64
+
+Slot = namedtuple("Slot", "offset nbytes")
+
+
+def _aligned(nbytes):
+    return (nbytes + ALIGN - 1) // ALIGN * ALIGN
+
+
+def array_view(buf, offset, shape, dtype=np.uint8):
+    """ndarray of shape over buf (a shared memory buffer) starting at offset."""
+    dtype = np.dtype(dtype)
+    count = int(np.prod(shape))
+    return np.frombuffer(buf, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+
+class ShmRing:
+    """
+    Ring-buffer allocator over one SharedMemory segment.
+
+    alloc() blocks until the slot fits, so the segment size bounds the
+    pixels in flight; requests larger than the whole ring raise ValueError.
+    """
+    def __init__(self, capacity):
+        self.capacity = _aligned(capacity)
+        self.shm = shared_memory.SharedMemory(create=True, size=self.capacity)
+        self._cond = threading.Condition()
+        self._blocks = deque()  # [offset, nbytes, freed] oldest first
+        self._head = 0
+        self._closed = False
+
+    @property
+    def name(self):
+        """Segment name workers attach to."""
+        return self.shm.name
+
+    @property
+    def buf(self):
+        return self.shm.buf
+
+    def _find(self, nbytes):
+        """Offset where nbytes fits right now, or None."""
+        if not self._blocks:
+            self._head = 0
+            return 0
+        tail = self._blocks[0][0]
+        if self._head > tail:
+            # Used space is [tail, head): room at the end, else wrap to the start
+            if self._head + nbytes <= self.capacity:
+                return self._head
+            if nbytes <= tail:
+                return 0
+        elif self._head < tail and self._head + nbytes <= tail:
+            # Wrapped: room is [head, tail)
+            return self._head
+        return None  # head == tail with blocks in use: full
+
+    def alloc(self, nbytes, timeout=None):
+        """Reserves nbytes, waiting for room. Returns a Slot."""
+        nbytes = _aligned(max(nbytes, 1))
+        if nbytes > self.capacity:
+            raise ValueError(f"{nbytes} bytes do not fit a {self.capacity} byte ring")
+        with self._cond:
+            offset = None
+            while not self._closed:
+                offset = self._find(nbytes)
+                if offset is not None:
+                    break
+                if not self._cond.wait(timeout):
+                    raise TimeoutError(f"no room for {nbytes} bytes in the shared memory ring")
+            if self._closed:
+                raise RuntimeError("ring is closed")
+            self._blocks.append([offset, nbytes, False])
+            self._head = offset + nbytes
+            return Slot(offset, nbytes)
+
+    def free(self, slot):
+        with self._cond:
+            for block in self._blocks:
+                if block[0] == slot.offset and not block[2]:
+                    block[2] = True
+                    break
+            else:
+                raise ValueError(f"slot at {slot.offset} is not allocated")
+            while self._blocks and self._blocks[0][2]:
+                self._blocks.popleft()
+            self._cond.notify_all()
+
+    def in_use(self):
+        """Bytes held by live slots."""
+        with self._cond:
+            return sum(nbytes for _, nbytes, freed in self._blocks if not freed)
+
+    def close(self):
+        """Releases and removes the segment; views into it must be gone."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,162 @@
+"""
+ONNX Runtime thread-count selection.
+
+Picks intra-op thread counts from the CPUs this process can really use
+(affinity mask, cgroup quota, current load) and, when asked, calibrates by
+timing a few counts on a dummy input. The winner is cached per model and
+machine, so calibration only runs once.
+"""
+import json
+import math
+import os
+import platform
+import statistics
+import threading
+import time
+
+import numpy as np
+
+_cache_lock = threading.Lock()
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read().strip()
+
+
+def cgroup_cpu_limit():
+    """CPU quota from cgroup v2 or v1 as a float core count, None if unlimited."""
+    try:
+        quota, period = _read("/sys/fs/cgroup/cpu.max").split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(_read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us"))
+        period = int(_read("/sys/fs/cgroup/cpu/cpu.cfs_period_us"))
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cores():
+    """CPUs this process may run on, respecting affinity and cgroup limits."""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:  # Windows / macOS
+        cores = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit:
+        cores = min(cores, math.ceil(limit))
+    return max(1, cores)
+
+
+def default_thread_count():
+    """
+    Intra-op threads to use when nothing was calibrated: None (ONNX Runtime's
+    default, one per physical core) unless affinity or a cgroup quota allows
+    fewer CPUs than the machine has, which ONNX Runtime does not see.
+    """
+    cores = available_cores()
+    return cores if cores < (os.cpu_count() or cores) else None
+
+
+def idle_cores():
+    """available_cores() minus what the 1-minute load average says is busy."""
+    cores = available_cores()
+    try:
+        busy = int(os.getloadavg()[0])
+    except (AttributeError, OSError):  # Windows, or /proc/loadavg hidden (Android)
+        return cores
+    return max(1, cores - busy)
+
+
+def candidate_counts(cores=None):
+    cores = cores or available_cores()
+    counts = {1, cores, max(1, cores // 2)}
+    n = 2
+    while n < cores:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+
+def dummy_feed(session):
+    """Zero input for the session's first input, dynamic dims set to 1."""
+    node = session.get_inputs()[0]
+    shape = [d if isinstance(d, int) and d > 0 else 1 for d in node.shape]
+    return {node.name: np.zeros(shape, dtype=np.float32)}
+
+
+def calibrate(make_session, candidates=None, warmup=1, runs=3):
+    """
+    Times make_session(threads) for each candidate count on a dummy input.
+    Returns (best_threads, {threads: median seconds per run}).
+    """
+    timings = {}
+    for threads in candidates or candidate_counts():
+        session = make_session(threads)
+        feed = dummy_feed(session)
+        output_names = [session.get_outputs()[0].name]
+        for _ in range(warmup):
+            session.run(output_names, feed)
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            session.run(output_names, feed)
+            samples.append(time.perf_counter() - start)
+        timings[threads] = statistics.median(samples)
+        del session
+    best = min(timings, key=timings.get)
+    return best, timings
+
+
+def cache_key(model_path):
+    try:
+        size = os.path.getsize(model_path)
+    except OSError:
+        size = 0
+    return f"{os.path.basename(model_path)}:{size}:{available_cores()}:{platform.machine()}"
+
+
+def load_cached(cache_path, model_path):
+    try:
+        with open(cache_path) as f:
+            return json.load(f).get(cache_key(model_path))
+    except (OSError, ValueError):
+        return None
+
+
+def store_cached(cache_path, model_path, threads):
+    with _cache_lock:
+        try:
+            with open(cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data[cache_key(model_path)] = threads
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, cache_path)
+
+
+def tuned_thread_count(model_path, make_session, cache_path, calibrate_if_missing=True):
+    """
+    Cached best thread count for model_path on this machine. Calibrates and
+    stores it when missing (or falls back to idle_cores() if not allowed to).
+    """
+    threads = load_cached(cache_path, model_path)
+    if threads:
+        return threads
+    if not calibrate_if_missing:
+        return idle_cores()
+    threads, _ = calibrate(make_session)
+    try:
+        store_cached(cache_path, model_path, threads)
+    except OSError:
+        pass  # Read-only location, calibrate again next time
+    return threads
@@ -0,0 +1,310 @@
+"""
+Hot-folder watch mode.
+
+Monitors input directories and removes the background from every new image
+that lands there, writing the cutouts to an output folder. Files are only
+picked up once they stop changing, so partially copied shoots are not read
+halfway through.
+
+Uses watchdog for filesystem events when it is installed (it ships with the
+portable runtime) and falls back to polling otherwise.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.admission import admitted_image
+from core.composite import Compositor
+from core.encoder import EncoderPool
+from core.engine import upright
+from core.metrics import REGISTRY
+
+log = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff"}
+
+# Shared with batch mode
+FILES = REGISTRY.counter("bgremover_files_total", "Input files handled, by mode and outcome.",
+                         ["mode", "status"])
+QUEUE_DEPTH = REGISTRY.gauge("bgremover_queue_depth", "Input files waiting (pending) or being processed.",
+                             ["mode", "state"])
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # Polling fallback
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.dest_path)
+
+
+class HotFolderWatcher:
+    """
+    Watches input_dirs and writes '<name>_nobg.<ext>' files into output_dir.
+
+    A file is considered complete once its size and mtime have been stable for
+    settle_time seconds and it decodes cleanly; truncated files are retried
+    until they finish arriving.
+    """
+    def __init__(self, input_dirs, output_dir, model_name="isnet-general-use",
+                 alpha_matting=True, post_process=True, workers=2,
+                 settle_time=2.0, poll_interval=1.0, recursive=False,
+                 output_format="png", preset="balanced", process_existing=False,
+                 max_retries=5, latency_budget_ms=1000, matting_mode="full", backgrounds=None,
+                 memory_budget=None, fast_paths=False):
+        self.input_dirs = [os.path.abspath(d) for d in input_dirs]
+        self.output_dir = os.path.abspath(output_dir)
+        self.model_name = model_name
+        self.alpha_matting = alpha_matting
+        self.post_process = post_process
+        self.workers = workers
+        self.settle_time = settle_time
+        self.poll_interval = poll_interval
+        self.recursive = recursive
+        self.output_ext = "." + output_format.lower()
+        self.preset = preset
+        self.process_existing = process_existing
+        self.max_retries = max_retries
+        self.latency_budget_ms = latency_budget_ms
+        self.matting_mode = matting_mode
+        # Skip the model for transparent / flat-backdrop images (core.fastpath)
+        self.fast_paths = fast_paths
+        # core.composite.Background list; each image is written once per background
+        self.backgrounds = backgrounds or []
+        # core.admission.MemoryBudget shared by the workers, None for no limit
+        self.memory_budget = memory_budget
+
+        self._lock = threading.Lock()
+        self._pending = {}   # path -> (size, mtime, last change time)
+        self._done = {}      # path -> mtime when processed
+        self._retries = {}
+        self._in_flight = set()
+        self._stop = threading.Event()
+        self._observer = None
+        self._remover = None
+        self._executor = None
+        self._encoder = None
+
+    def is_candidate(self, path):
+        path = os.path.abspath(path)
+        if os.path.splitext(path)[1].lower() not in IMAGE_EXTENSIONS:
+            return False
+        # Never feed our own results back in when the output lives under an input
+        return not path.startswith(self.output_dir + os.sep)
+
+    def output_path(self, path, background_index=None):
+        base = os.path.splitext(os.path.basename(path))[0]
+        suffix = "nobg" if background_index is None else f"bg{background_index + 1}"
+        return os.path.join(self.output_dir, f"{base}_{suffix}{self.output_ext}")
+
+    def notify(self, path):
+        """Registers a created/changed file. Safe to call from any thread."""
+        if not self.is_candidate(path):
+            return
+        path = os.path.abspath(path)
+        with self._lock:
+            if path not in self._pending and path not in self._in_flight:
+                self._pending[path] = (-1, -1, time.monotonic())
+
+    def _scan(self):
+        for root in self.input_dirs:
+            for dirpath, dirnames, filenames in os.walk(root):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    if not self.is_candidate(path):
+                        continue
+                    try:
+                        mtime = os.stat(path).st_mtime
+                    except OSError:
+                        continue
+                    if self._done.get(path) != mtime:
+                        self.notify(path)
+                if not self.recursive:
+                    break
+
+    def _collect_ready(self):
+        """Moves files whose size and mtime have settled out of the pending set."""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, (size, mtime, changed) in list(self._pending.items()):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    del self._pending[path]  # Removed or renamed away
+                    continue
+                if (st.st_size, st.st_mtime) != (size, mtime):
+                    self._pending[path] = (st.st_size, st.st_mtime, now)
+                elif st.st_size > 0 and now - changed >= self.settle_time:
+                    del self._pending[path]
+                    if self._done.get(path) == st.st_mtime:
+                        continue
+                    self._in_flight.add(path)
+                    ready.append((path, st.st_mtime))
+        return ready
+
+    def job_flags(self):
+        """Settings that drive the per-image memory estimate."""
+        return {
+            "alpha_matting": self.alpha_matting,
+            "matting_mode": self.matting_mode,
+            "post_process": self.post_process,
+            "backgrounds": len(self.backgrounds),
+        }
+
+    def _process(self, path, mtime):
+        try:
+            with admitted_image(path, self.memory_budget, **self.job_flags()) as img:
+                # Orient once: the remover and the compositor then share the same copy
+                img = upright(img)
+                result = self._remover.process_image(
+                    img, alpha_matting=self.alpha_matting, post_process=self.post_process,
+                    matting_mode=self.matting_mode, fast_paths=self.fast_paths
+                )
+                if self.backgrounds:
+                    # One mask, many backgrounds: the compositor is set up once
+                    compositor = Compositor(result, original=img)
+                    outputs = [(self.output_path(path, i), compositor.composite_image(bg))
+                               for i, bg in enumerate(self.backgrounds)]
+                else:
+                    outputs = [(self.output_path(path), result)]
+        except OSError as e:
+            # Usually a file that is still being written; try again later
+            self._retry_or_give_up(path, mtime, e)
+            return
+        except Exception:
+            with self._lock:
+                self._in_flight.discard(path)
+                self._done[path] = mtime
+            FILES.labels(mode="watch", status="failed").inc()
+            log.exception("Failed to process %s", path)
+            return
+
+        # Shared by the file's outputs: writes left, and whether any failed
+        state = {"remaining": len(outputs), "error": None}
+        for out_path, image in outputs:
+            future = self._encoder.submit(image, out_path)
+            future.add_done_callback(
+                lambda f, out_path=out_path: self._on_written(path, mtime, out_path, f, state)
+            )
+
+    def _retry_or_give_up(self, path, mtime, error):
+        """Queues path again, or records it as failed once max_retries is used up."""
+        with self._lock:
+            retries = self._retries.get(path, 0) + 1
+            self._in_flight.discard(path)
+            if retries <= self.max_retries:
+                self._retries[path] = retries
+                self._pending[path] = (-1, -1, time.monotonic())
+                FILES.labels(mode="watch", status="retried").inc()
+                return
+            self._done[path] = mtime
+            self._retries.pop(path, None)
+        FILES.labels(mode="watch", status="failed").inc()
+        log.error("Giving up on %s: %s", path, error)
+
+    def _on_written(self, path, mtime, out_path, future, state):
+        error = future.exception()
+        if error:
+            log.error("Failed to write %s: %s", out_path, error)
+        else:
+            log.info("%s -> %s", os.path.basename(path), out_path)
+        with self._lock:
+            state["remaining"] -= 1
+            state["error"] = state["error"] or error
+            if state["remaining"]:
+                return
+            if not state["error"]:
+                self._in_flight.discard(path)
+                self._done[path] = mtime
+                self._retries.pop(path, None)
+        # Last output: the file counts once, done only if every output was written
+        if state["error"]:
+            self._retry_or_give_up(path, mtime, state["error"])
+        else:
+            FILES.labels(mode="watch", status="done").inc()
+
+    def start(self):
+        from core.remover import BgRemover, resolve_model
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        model_name, input_size = resolve_model(self.model_name, self.latency_budget_ms)
+        self._remover = BgRemover(model_name, input_size=input_size)
+        if self.memory_budget is not None:
+            # The budget's baseline was taken before the model was loaded
+            self.memory_budget.rebaseline()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._encoder = EncoderPool(preset=self.preset)
+        QUEUE_DEPTH.labels(mode="watch", state="pending").set_function(lambda: len(self._pending))
+        QUEUE_DEPTH.labels(mode="watch", state="in_flight").set_function(lambda: len(self._in_flight))
+
+        if not self.process_existing:
+            # Treat what is already there as handled
+            for root in self.input_dirs:
+                for dirpath, dirnames, filenames in os.walk(root):
+                    for name in filenames:
+                        path = os.path.join(dirpath, name)
+                        if self.is_candidate(path):
+                            self._done[path] = os.stat(path).st_mtime
+                    if not self.recursive:
+                        break
+
+        if Observer is not None:
+            self._observer = Observer()
+            handler = _EventHandler(self)
+            for root in self.input_dirs:
+                self._observer.schedule(handler, root, recursive=self.recursive)
+            self._observer.start()
+            log.info("Watching %s (watchdog)", ", ".join(self.input_dirs))
+        else:
+            log.info("Watching %s (polling every %.1fs)", ", ".join(self.input_dirs), self.poll_interval)
+
+        if self.process_existing or Observer is None:
+            self._scan()
+
+    def poll(self):
+        """One debounce pass: rescans when polling and dispatches settled files."""
+        if self._observer is None:
+            self._scan()
+        for path, mtime in self._collect_ready():
+            self._executor.submit(self._process, path, mtime)
+
+    def run_forever(self):
+        self.start()
+        try:
+            while not self._stop.wait(self.poll_interval):
+                self.poll()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        if self._encoder is not None:
+            self._encoder.close()
@@ -2,25 +2,35 @@ import sys
 import os
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QLabel, QPushButton, QFileDialog, QFrame, QProgressBar, QMessageBox,
-                             QComboBox, QCheckBox, QGroupBox)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize, QUrl, QBuffer
+                             QComboBox, QCheckBox, QGroupBox, QSlider, QSpinBox, QRubberBand)
+from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize, QUrl, QBuffer, QTimer, QRect, QPoint
 from PyQt6.QtGui import QPixmap, QImage, QIcon, QDragEnterEvent, QDropEvent, QAction
 from PIL import Image, ImageQt
+import numpy as np
+import threading
 import time
 
-# Import core logic
-from core.remover import remove_background
+# Import core logic (cheap: the ML stack inside is imported lazily)
+from core.engine import upright
+from core.remover import remove_background, preload
+from core.refine import refine_mask, compose_rgba
+from core.encoder import save_image as encode_image
 
 class Worker(QThread):
     finished = pyqtSignal(object)
     error = pyqtSignal(str)
 
-    def __init__(self, image, model_name, alpha_matting, post_process):
+    def __init__(self, image, model_name, alpha_matting, post_process, latency_budget_ms=1000,
+                 matting_mode="full", fast_paths=False, bbox=None):
         super().__init__()
         self.image = image
         self.model_name = model_name
         self.alpha_matting = alpha_matting
         self.post_process = post_process
+        self.latency_budget_ms = latency_budget_ms
+        self.matting_mode = matting_mode
+        self.fast_paths = fast_paths
+        self.bbox = bbox
 
     def run(self):
         try:
@@ -29,12 +39,43 @@ class Worker(QThread):
                 self.image, 
                 model_name=self.model_name, 
                 alpha_matting=self.alpha_matting,
-                post_process=self.post_process
+                post_process=self.post_process,
+                latency_budget_ms=self.latency_budget_ms,
+                matting_mode=self.matting_mode,
+                fast_paths=self.fast_paths,
+                bbox=self.bbox
             )
             self.finished.emit(result)
         except Exception as e:
             self.error.emit(str(e))
 
+def render_result(result_image, soft_mask, cutout_rgb, adjustments):
+    """Full resolution result with the (threshold, erode, feather) edge adjustments applied."""
+    threshold, erode, feather = adjustments
+    if soft_mask is None or not (threshold or erode or feather):
+        return result_image
+    mask = refine_mask(soft_mask, threshold, erode, feather)
+    return Image.fromarray(compose_rgba(cutout_rgb, mask))
+
+class SaveWorker(QThread):
+    finished = pyqtSignal(str)
+    error = pyqtSignal(str)
+
+    def __init__(self, snapshot, file_path, preset):
+        """snapshot: render_result() arguments, taken on the GUI thread."""
+        super().__init__()
+        self.snapshot = snapshot
+        self.file_path = file_path
+        self.preset = preset
+
+    def run(self):
+        try:
+            # Full-res recomposite and encoding both stay off the GUI thread
+            encode_image(render_result(*self.snapshot), self.file_path, preset=self.preset)
+            self.finished.emit(self.file_path)
+        except Exception as e:
+            self.error.emit(str(e))
+
 class ImageDropLabel(QLabel):
     fileDropped = pyqtSignal(str)
 
@@ -74,6 +115,67 @@ class ImageDropLabel(QLabel):
             # Trigger file dialog from parent
             self.window().open_file_dialog()
 
+class RegionSelectLabel(QLabel):
+    """Image preview the user can drag a box on to pick the subject."""
+    # (left, top, right, bottom) in image pixels, or None when cleared
+    regionSelected = pyqtSignal(object)
+
+    def __init__(self):
+        super().__init__()
+        self.image_size = None
+        self._origin = None
+        self._band = QRubberBand(QRubberBand.Shape.Rectangle, self)
+
+    def _pixmap_rect(self):
+        """Where the (centred) pixmap is drawn inside the label."""
+        pixmap = self.pixmap()
+        if pixmap is None or pixmap.isNull() or self.image_size is None:
+            return None
+        area = self.contentsRect()
+        return QRect(area.x() + (area.width() - pixmap.width()) // 2,
+                     area.y() + (area.height() - pixmap.height()) // 2,
+                     pixmap.width(), pixmap.height())
+
+    def set_region(self, box):
+        """Shows box (image pixels) on the current pixmap, or hides it for None."""
+        shown = self._pixmap_rect()
+        if box is None or shown is None:
+            self._band.hide()
+            return
+        scale = shown.width() / self.image_size[0]
+        self._band.setGeometry(QRect(QPoint(shown.x() + round(box[0] * scale), shown.y() + round(box[1] * scale)),
+                                     QPoint(shown.x() + round(box[2] * scale) - 1,
+                                            shown.y() + round(box[3] * scale) - 1)))
+        self._band.show()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.RightButton:
+            self._band.hide()
+            self.regionSelected.emit(None)
+        elif event.button() == Qt.MouseButton.LeftButton and self._pixmap_rect() is not None:
+            self._origin = event.position().toPoint()
+            self._band.setGeometry(QRect(self._origin, QSize()))
+            self._band.show()
+
+    def mouseMoveEvent(self, event):
+        if self._origin is not None:
+            rect = QRect(self._origin, event.position().toPoint()).normalized()
+            self._band.setGeometry(rect.intersected(self._pixmap_rect()))
+
+    def mouseReleaseEvent(self, event):
+        if self._origin is None or event.button() != Qt.MouseButton.LeftButton:
+            return
+        self._origin = None
+        rect, shown = self._band.geometry(), self._pixmap_rect()
+        if rect.width() < 8 or rect.height() < 8:
+            self._band.hide()  # A click, not a drag
+            return
+        scale = self.image_size[0] / shown.width()
+        self.regionSelected.emit((round((rect.left() - shown.x()) * scale),
+                                  round((rect.top() - shown.y()) * scale),
+                                  round((rect.right() + 1 - shown.x()) * scale),
+                                  round((rect.bottom() + 1 - shown.y()) * scale)))
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -85,10 +187,31 @@ class MainWindow(QMainWindow):
         self.original_image = None
         self.processed_image = None
         self.current_file_path = None
+        # Region the user dragged around the subject (image pixels), None for the whole image
+        self.roi = None
+
+        # Cached result used by the edge sliders (full res + preview sized)
+        self.soft_mask = None
+        self.cutout_rgb = None
+        self._preview = None
+        self._preview_rgba = None
 
         self.init_ui()
         self.apply_styles()
 
+        # Fires once the event loop runs, i.e. after the window is on screen
+        QTimer.singleShot(0, self.start_warm_up)
+
+    def start_warm_up(self):
+        # Import rembg/onnxruntime in the background so the first image doesn't wait
+        threading.Thread(target=self._warm_up, daemon=True).start()
+
+    def _warm_up(self):
+        try:
+            preload()
+        except Exception:
+            pass  # Surfaces properly on the first real run
+
     def init_ui(self):
         # Main Layout
         central_widget = QWidget()
@@ -113,8 +236,11 @@ class MainWindow(QMainWindow):
         self.drop_label.fileDropped.connect(self.process_image_path)
         
         # Image Projectors (Hidden initially)
-        self.original_label = QLabel()
+        self.original_label = RegionSelectLabel()
         self.original_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.original_label.setToolTip("Drag a box around a small subject to process just that area "
+                                       "at full detail. Right-click to use the whole image again.")
+        self.original_label.regionSelected.connect(self.on_region_selected)
         self.original_label.setStyleSheet("border: 1px solid #444; background: #222; border-radius: 8px;")
         self.original_label.setMinimumSize(300, 400)
         
@@ -198,28 +324,93 @@ class MainWindow(QMainWindow):
         self.combo_model.addItem("U2-Net (Standard)", "u2net")
         self.combo_model.addItem("Human Segmentation", "u2net_human_seg")
         self.combo_model.addItem("Cloth/Product", "u2net_cloth_seg")
+        self.combo_model.addItem("Silueta (Compact)", "silueta")
+        self.combo_model.addItem("U2-Net Lite (Fastest)", "u2netp")
+        self.combo_model.addItem("Auto (Fit Time Budget)", "auto")
         self.combo_model.setStyleSheet("QComboBox { background: #333; color: white; padding: 5px; border-radius: 3px; } QComboBox::drop-down { border: none; }")
+
+        # Latency budget for the "Auto" model choice
+        self.spin_budget = QSpinBox()
+        self.spin_budget.setRange(50, 10000)
+        self.spin_budget.setSingleStep(50)
+        self.spin_budget.setValue(1000)
+        self.spin_budget.setSuffix(" ms")
+        self.spin_budget.setToolTip("Auto picks the best model that runs within this time on this PC.")
+        self.spin_budget.setStyleSheet("QSpinBox { background: #333; color: white; padding: 5px; border-radius: 3px; }")
+        self.spin_budget.setEnabled(False)
+        self.combo_model.currentIndexChanged.connect(
+            lambda _: self.spin_budget.setEnabled(self.combo_model.currentData() == "auto")
+        )
         
         # Checkboxes
         self.chk_alpha = QCheckBox("Refine Edges")
         self.chk_alpha.setChecked(True) # Default On
         self.chk_alpha.setToolTip("Enable for hair/fur details. Disable for hard objects.")
         self.chk_alpha.setStyleSheet("QCheckBox { color: #ccc; }")
+
+        # Where edge refinement runs: whole image, or just the band along the outline
+        self.combo_matting = QComboBox()
+        self.combo_matting.addItem("Full Matting", "full")
+        self.combo_matting.addItem("Edge Band (Fast)", "band")
+        self.combo_matting.setToolTip("Edge Band refines only the pixels along the outline; much faster on large photos.")
+        self.combo_matting.setStyleSheet(self.combo_model.styleSheet())
+        self.chk_alpha.toggled.connect(self.combo_matting.setEnabled)
         
         self.chk_post = QCheckBox("Post-Process")
         self.chk_post.setChecked(True) # Default On
         self.chk_post.setToolTip("Cleans up small floating pixels.")
         self.chk_post.setStyleSheet("QCheckBox { color: #ccc; }")
 
+        self.chk_fast = QCheckBox("Skip AI When Possible")
+        self.chk_fast.setChecked(False)
+        self.chk_fast.setToolTip("Keeps existing transparency and cuts out plain studio backdrops "
+                                 "by colour. Other images still use the AI model.")
+        self.chk_fast.setStyleSheet("QCheckBox { color: #ccc; }")
+
         settings_layout.addWidget(QLabel("Model:"))
         settings_layout.addWidget(self.combo_model, 1)
+        settings_layout.addWidget(self.spin_budget)
         settings_layout.addWidget(self.chk_alpha)
+        settings_layout.addWidget(self.combo_matting)
         settings_layout.addWidget(self.chk_post)
+        settings_layout.addWidget(self.chk_fast)
+
+        # Output compression
+        self.combo_compress = QComboBox()
+        self.combo_compress.addItem("Fast", "fast")
+        self.combo_compress.addItem("Balanced", "balanced")
+        self.combo_compress.addItem("Smallest File", "smallest")
+        self.combo_compress.setCurrentIndex(1)
+        self.combo_compress.setToolTip("Compression used when saving PNG / WebP.")
+        self.combo_compress.setStyleSheet(self.combo_model.styleSheet())
+        settings_layout.addWidget(QLabel("Save:"))
+        settings_layout.addWidget(self.combo_compress)
         
         settings_group.setLayout(settings_layout)
         
+        # Edge Adjustments (re-applied to the cached mask, no re-run needed)
+        adjust_group = QGroupBox("Edge Adjustments")
+        adjust_group.setStyleSheet(settings_group.styleSheet())
+        adjust_layout = QHBoxLayout()
+        adjust_layout.setContentsMargins(10, 15, 10, 10)
+
+        # Coalesce slider drags into one recomposite per event loop pass
+        self.adjust_timer = QTimer(self)
+        self.adjust_timer.setSingleShot(True)
+        self.adjust_timer.setInterval(0)
+        self.adjust_timer.timeout.connect(self.show_result)
+
+        self.slider_threshold = self.add_slider(adjust_layout, "Threshold", 0, 254,
+                                                "0 keeps the soft mask, higher values cut a hard edge.")
+        self.slider_erode = self.add_slider(adjust_layout, "Erode", -10, 20,
+                                            "Shrinks the mask (negative values grow it).")
+        self.slider_feather = self.add_slider(adjust_layout, "Feather", 0, 30,
+                                              "Softens the edge by this many pixels.")
+        adjust_group.setLayout(adjust_layout)
+
         # Add to main layout (Insert before controls)
         main_layout.addWidget(settings_group)
+        main_layout.addWidget(adjust_group)
         main_layout.addLayout(controls_layout)
 
         controls_layout.addWidget(self.btn_clear)
@@ -243,6 +434,33 @@ class MainWindow(QMainWindow):
             # Optional: Add logo to header if desired
             # for now, Window Icon is sufficient for professional feel
 
+    def add_slider(self, layout, title, minimum, maximum, tooltip):
+        slider = QSlider(Qt.Orientation.Horizontal)
+        slider.setRange(minimum, maximum)
+        slider.setValue(0)
+        slider.setToolTip(tooltip)
+
+        value_label = QLabel("0")
+        value_label.setMinimumWidth(28)
+        value_label.setStyleSheet("color: #ccc;")
+        title_label = QLabel(f"{title}:")
+        title_label.setStyleSheet("color: #ccc;")
+
+        def on_change(value):
+            value_label.setText(str(value))
+            self.adjust_timer.start()
+
+        slider.valueChanged.connect(on_change)
+        layout.addWidget(title_label)
+        layout.addWidget(slider, 1)
+        layout.addWidget(value_label)
+        return slider
+
+    def adjustment_values(self):
+        return (self.slider_threshold.value(),
+                self.slider_erode.value(),
+                self.slider_feather.value())
+
     def apply_styles(self):
         self.setStyleSheet("""
             QMainWindow {
@@ -302,9 +520,10 @@ class MainWindow(QMainWindow):
             pixmap.save(buffer, "PNG")
             pil_im = Image.open(io.BytesIO(buffer.data()))
             
-            self.original_image = pil_im
+            self.original_image = upright(pil_im)
+            self.roi = None
             self.setup_split_view()
-            self.display_image(self.original_image, self.original_label)
+            self.show_original()
             self.start_removal_thread()
         except NameError:
              from PyQt6.QtCore import QBuffer
@@ -314,9 +533,10 @@ class MainWindow(QMainWindow):
              buffer.open(QBuffer.OpenModeFlag.ReadWrite)
              pixmap.save(buffer, "PNG")
              pil_im = Image.open(io.BytesIO(buffer.data()))
-             self.original_image = pil_im
+             self.original_image = upright(pil_im)
+             self.roi = None
              self.setup_split_view()
-             self.display_image(self.original_image, self.original_label)
+             self.show_original()
              self.start_removal_thread()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load clipboard image: {str(e)}")
@@ -326,12 +546,14 @@ class MainWindow(QMainWindow):
         self.status_label.setText(f"Loading {os.path.basename(file_path)}...")
         
         try:
-            self.original_image = Image.open(file_path)
-            # Fix orientation or format if needed
-            self.original_image.load() # Force load
-            
+            image = Image.open(file_path)
+            image.load() # Force load
+            # Fix orientation, so the preview (and any region drawn on it) matches the result
+            self.original_image = upright(image)
+            self.roi = None
+
             self.setup_split_view()
-            self.display_image(self.original_image, self.original_label)
+            self.show_original()
             self.start_removal_thread()
             
         except Exception as e:
@@ -357,44 +579,82 @@ class MainWindow(QMainWindow):
         use_post = self.chk_post.isChecked()
         
         status_msg = f"Processing with {self.combo_model.currentText()}..."
-        if model_name != "isnet-general-use" and model_name != "u2net": 
+        if model_name not in ("isnet-general-use", "u2net"):
              status_msg += " (First run may take time to download)"
         
+        if self.roi is not None:
+            status_msg += " (selected region)"
         self.status_label.setText(status_msg)
         self.progress_bar.show()
+        self.soft_mask = None
         self.result_label.setText("Processing...")
         
         self.btn_open.setEnabled(False)
         self.btn_clear.setEnabled(False)
         self.btn_save.setEnabled(False)
         self.combo_model.setEnabled(False) # Lock controls
+        self.spin_budget.setEnabled(False)
         self.chk_alpha.setEnabled(False)
+        self.combo_matting.setEnabled(False)
         self.chk_post.setEnabled(False)
+        self.chk_fast.setEnabled(False)
 
-        self.worker = Worker(self.original_image, model_name, use_alpha, use_post)
+        self.worker = Worker(self.original_image, model_name, use_alpha, use_post, self.spin_budget.value(),
+                             self.combo_matting.currentData(), self.chk_fast.isChecked(), self.roi)
         self.worker.finished.connect(self.on_processing_finished)
         self.worker.error.connect(self.on_processing_error)
         self.worker.start()
 
     def on_processing_finished(self, result_image):
         self.processed_image = result_image
+        self.cache_result(result_image)
         self.progress_bar.hide()
         self.status_label.setText("Done!")
-        self.display_image(self.processed_image, self.result_label)
+        self.show_result()
         self.btn_save.setEnabled(True)
-        self.btn_open.setEnabled(True)
-        self.btn_clear.setEnabled(True)
-        self.combo_model.setEnabled(True)
-        self.chk_alpha.setEnabled(True)
-        self.chk_post.setEnabled(True)
+        self.unlock_controls()
 
     def on_processing_error(self, error_msg):
         self.progress_bar.hide()
         self.status_label.setText("Error occurred.")
         self.result_label.setText("Failed")
+        self.unlock_controls()  # So another model / setting can be tried
         QMessageBox.critical(self, "Processing Error", error_msg)
 
+    def unlock_controls(self):
+        # Undoes the lock in start_removal_thread (Save is up to the caller)
+        self.btn_open.setEnabled(True)
+        self.btn_clear.setEnabled(True)
+        self.combo_model.setEnabled(True)
+        self.spin_budget.setEnabled(self.combo_model.currentData() == "auto")
+        self.chk_alpha.setEnabled(True)
+        self.combo_matting.setEnabled(self.chk_alpha.isChecked())
+        self.chk_post.setEnabled(True)
+        self.chk_fast.setEnabled(True)
+
+    def show_original(self):
+        self.original_label.image_size = self.original_image.size
+        self.display_image(self.original_image, self.original_label)
+        self.original_label.set_region(self.roi)
+
+    def on_region_selected(self, box):
+        if self.original_image is None or box == self.roi:
+            return
+        if getattr(self, "worker", None) is not None and self.worker.isRunning():
+            self.original_label.set_region(self.roi)  # Busy, keep the region being processed
+            return
+        self.roi = box
+        self.start_removal_thread()
+
     def display_image(self, pil_image, label_widget):
+        # Shrink to the label before converting, so a 50MP photo does not
+        # get a full-resolution RGBA copy just to be shown at ~800px
+        target = label_widget.size()
+        scale = min(target.width() / pil_image.width, target.height() / pil_image.height)
+        if 0 < scale < 1:
+            size = (max(1, round(pil_image.width * scale)), max(1, round(pil_image.height * scale)))
+            pil_image = pil_image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
         # PIL to QImage
         im_data = pil_image.convert("RGBA").tobytes("raw", "RGBA")
         qim = QImage(im_data, pil_image.size[0], pil_image.size[1], QImage.Format.Format_RGBA8888)
@@ -408,6 +668,56 @@ class MainWindow(QMainWindow):
         )
         label_widget.setPixmap(scaled_pixmap)
 
+    def cache_result(self, result_image):
+        # Keep the soft mask so the edge sliders can recomposite without inference
+        rgba = np.asarray(result_image.convert("RGBA"))
+        self.soft_mask = rgba[..., 3].copy()
+        rgb = rgba[..., :3]
+        if self.original_image is not None and self.original_image.size == result_image.size:
+            # Cutouts black out colour under transparent pixels, take it from the
+            # original so growing the mask doesn't reveal a dark fringe.
+            original = np.asarray(self.original_image.convert("RGB"))
+            rgb = np.where(self.soft_mask[..., None] > 0, rgb, original)
+        self.cutout_rgb = np.ascontiguousarray(rgb)
+        # A save thread may still be rendering the previous arrays
+        self.soft_mask.flags.writeable = False
+        self.cutout_rgb.flags.writeable = False
+        self._preview = None
+
+    def show_result(self):
+        """
+        Recomposites the result preview from the cached mask with the current
+        edge adjustments. Works at label resolution so sliders stay interactive.
+        """
+        if self.soft_mask is None or not self.result_label.isVisible():
+            return
+
+        h, w = self.soft_mask.shape
+        box = self.result_label.size()
+        scale = min(box.width() / w, box.height() / h, 1.0)
+        pw, ph = max(1, int(w * scale)), max(1, int(h * scale))
+
+        if self._preview is None or self._preview[0] != (pw, ph):
+            rgb = Image.fromarray(self.cutout_rgb).resize((pw, ph), Image.Resampling.BILINEAR)
+            mask = Image.fromarray(self.soft_mask).resize((pw, ph), Image.Resampling.BILINEAR)
+            self._preview = ((pw, ph), scale, np.asarray(rgb), np.asarray(mask))
+        _, scale, rgb, mask = self._preview
+
+        threshold, erode, feather = self.adjustment_values()
+        refined = refine_mask(mask, threshold, round(erode * scale), round(feather * scale))
+        self._preview_rgba = compose_rgba(rgb, refined, self._preview_rgba)
+
+        qim = QImage(self._preview_rgba.data, pw, ph, pw * 4, QImage.Format.Format_RGBA8888)
+        self.result_label.setPixmap(QPixmap.fromImage(qim))
+
+    def result_snapshot(self):
+        """
+        render_result() arguments for the current result and sliders. The
+        cached arrays are read-only and only ever replaced, so holding them is
+        safe while the GUI starts a new image or clears this one.
+        """
+        return self.processed_image, self.soft_mask, self.cutout_rgb, self.adjustment_values()
+
     def save_image(self):
         if not self.processed_image:
             return
@@ -417,22 +727,50 @@ class MainWindow(QMainWindow):
             base = os.path.splitext(os.path.basename(self.current_file_path))[0]
             initial_name = f"{base}_nobg.png"
 
-        file_path, _ = QFileDialog.getSaveFileName(
-            self, "Save Image", initial_name, "PNG Image (*.png)"
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Save Image", initial_name, "PNG Image (*.png);;WebP Lossless (*.webp)"
         )
-        
-        if file_path:
-            try:
-                self.processed_image.save(file_path)
-                self.status_label.setText(f"Saved to {file_path}")
-                QMessageBox.information(self, "Success", "Image saved successfully!")
-            except Exception as e:
-                QMessageBox.critical(self, "Save Error", f"Failed to save image: {str(e)}")
+        if not file_path:
+            return
+
+        if not os.path.splitext(file_path)[1]:
+            file_path += ".webp" if "webp" in selected_filter else ".png"
+
+        # Snapshot the result and sliders now, the render happens on the save thread
+        self.save_worker = SaveWorker(self.result_snapshot(), file_path,
+                                      self.combo_compress.currentData())
+        self.save_worker.finished.connect(self.on_save_finished)
+        self.save_worker.error.connect(self.on_save_error)
+
+        self.btn_save.setEnabled(False)
+        self.btn_clear.setEnabled(False)
+        self.progress_bar.show()
+        self.status_label.setText(f"Saving {os.path.basename(file_path)}...")
+        self.save_worker.start()
+
+    def on_save_finished(self, file_path):
+        self.progress_bar.hide()
+        self.btn_save.setEnabled(True)
+        self.btn_clear.setEnabled(True)
+        self.status_label.setText(f"Saved to {file_path}")
+        QMessageBox.information(self, "Success", "Image saved successfully!")
+
+    def on_save_error(self, error_msg):
+        self.progress_bar.hide()
+        self.btn_save.setEnabled(True)
+        self.btn_clear.setEnabled(True)
+        self.status_label.setText("Save failed.")
+        QMessageBox.critical(self, "Save Error", f"Failed to save image: {error_msg}")
 
     def reset_ui(self):
         self.original_image = None
         self.processed_image = None
         self.current_file_path = None
+        self.roi = None
+        self.original_label.set_region(None)
+        self.soft_mask = None
+        self.cutout_rgb = None
+        self._preview = None
         
         # Remove split view widget
         self.original_label.setParent(None)
@@ -455,9 +793,9 @@ class MainWindow(QMainWindow):
     def resizeEvent(self, event):
         # Re-scale images on resize if they exist
         if self.original_image and self.original_label.isVisible():
-            self.display_image(self.original_image, self.original_label)
+            self.show_original()
         if self.processed_image and self.result_label.isVisible():
-            self.display_image(self.processed_image, self.result_label)
+            self.show_result()
         super().resizeEvent(event)
 
 if __name__ == "__main__":
@@ -15,10 +15,17 @@ if sys.stderr is None: sys.stderr = NullWriter()
 # This is required for Embeddable Python to find local modules like 'gui' and 'core'
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from PyQt6.QtWidgets import QApplication
-from gui.mainwindow import MainWindow
-
 def main():
+    # Command line modes (e.g. 'watch') run headless and never load Qt. Anything
+    # else, like an image path from "Open with", still starts the GUI.
+    from core.cli import COMMANDS
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        from core.cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
+    from PyQt6.QtWidgets import QApplication
+    from gui.mainwindow import MainWindow
+
     app = QApplication(sys.argv)
     
     # Optional: Set global font or style
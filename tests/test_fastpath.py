@@ -0,0 +1,41 @@
+"""
+core.fastpath on edge cases: images too small for the border sampling must
+go to the model instead of raising, while a clean studio shot still takes
+the flat-backdrop path.
+
+    python -m pytest tests
+"""
+import unittest
+
+from PIL import Image, ImageDraw
+
+from core.fastpath import FLAT, PASSTHROUGH, fast_cutout
+
+
+class FastPathTest(unittest.TestCase):
+    def test_tiny_images_go_to_the_model(self):
+        for size in [(1, 1), (2, 2), (3, 3), (200, 3), (3, 200), (15, 400)]:
+            with self.subTest(size=size):
+                cutout, decision = fast_cutout(Image.new("RGB", size, "white"))
+                self.assertIsNone(cutout)
+                self.assertEqual(decision.kind, FLAT)
+                self.assertEqual(decision.confidence, 0.0)
+
+    def test_tiny_transparent_image_passes_through(self):
+        img = Image.new("RGBA", (3, 3), (255, 0, 0, 255))
+        img.putpixel((0, 0), (0, 0, 0, 0))
+        cutout, decision = fast_cutout(img)
+        self.assertEqual(decision.kind, PASSTHROUGH)
+        self.assertEqual(cutout.getpixel((0, 0))[3], 0)
+
+    def test_flat_backdrop(self):
+        img = Image.new("RGB", (400, 300), "white")
+        ImageDraw.Draw(img).rectangle((120, 80, 280, 220), fill=(200, 30, 30))
+        cutout, decision = fast_cutout(img)
+        self.assertEqual(decision.kind, FLAT)
+        self.assertEqual(cutout.getpixel((5, 5))[3], 0)
+        self.assertEqual(cutout.getpixel((200, 150))[3], 255)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+core.jobs.JobManifest: status updates from many threads are batched by the
+writer thread and all land by close(), and add() re-queues an input only
+when its file or its outputs changed.
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from core.jobs import DONE, FAILED, PENDING, JobManifest
+
+
+def _jobs(n, size=100, mtime=1.0):
+    return [(f"/in/{i:05d}.jpg", [f"/out/{i:05d}.png"], size, mtime) for i in range(n)]
+
+
+class JobManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "jobs.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_concurrent_updates_all_land_by_close(self):
+        jobs = _jobs(3000)
+        with JobManifest(self.path, flush_interval=0.05, batch_size=100) as manifest:
+            manifest.add(jobs)
+
+            def mark(part):
+                for i, (path, _, _, _) in enumerate(jobs[part::4]):
+                    if i % 10 == 0:
+                        manifest.mark_failed(path, ValueError(f"bad {path}"), 1.0)
+                    else:
+                        manifest.mark_done(path, 2.0)
+
+            threads = [threading.Thread(target=mark, args=(part,)) for part in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        with JobManifest(self.path) as manifest:
+            counts = manifest.counts()
+            failures = manifest.failures()
+        self.assertEqual(counts, {DONE: 2700, FAILED: 300})
+        self.assertEqual(len(failures), 300)
+        self.assertTrue(all(error == f"bad {path}" for path, error in failures))
+
+    def test_updates_are_written_while_running(self):
+        with JobManifest(self.path, flush_interval=0.05) as manifest:
+            manifest.add(_jobs(3))
+            manifest.mark_done("/in/00001.jpg", 1.0)
+            deadline = time.monotonic() + 5
+            while manifest.counts().get(DONE) != 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(manifest.counts(), {PENDING: 2, DONE: 1})
+
+    def test_only_changed_inputs_are_requeued(self):
+        with JobManifest(self.path) as manifest:
+            manifest.add(_jobs(4))
+            for path, _, _, _ in _jobs(4):
+                manifest.mark_failed(path, "boom")
+
+        changed = _jobs(4)
+        changed[1] = (changed[1][0], changed[1][1], 200, 1.0)               # size
+        changed[2] = (changed[2][0], changed[2][1], 100, 2.0)               # mtime
+        changed[3] = (changed[3][0], ["/out/elsewhere.png"], 100, 1.0)      # outputs
+        with JobManifest(self.path) as manifest:
+            manifest.add(changed)
+            self.assertEqual(manifest.pending(), [(path, outputs) for path, outputs, _, _ in changed[1:]])
+            self.assertEqual(manifest.failures(), [("/in/00000.jpg", "boom")])
+            # Re-queued rows start over
+            rows = manifest._conn.execute("SELECT attempts, error FROM jobs WHERE status = ?", (PENDING,))
+            self.assertEqual(list(rows), [(0, None)] * 3)
+            self.assertEqual([path for path, _ in manifest.pending(retry_failed=True)],
+                             [path for path, _, _, _ in changed])
+
+
+if __name__ == "__main__":
+    unittest.main()
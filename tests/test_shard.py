@@ -0,0 +1,122 @@
+"""
+core.shard.ShardQueue: every job is claimed exactly once, expired leases go
+back to the queue (and give up after max_attempts), and a late complete()
+from a worker whose lease expired does not get the job processed twice.
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from core.jobs import DONE, FAILED
+from core.shard import ShardQueue
+
+
+def _jobs(n, mtime=1.0):
+    return [(f"/in/{i:03d}.jpg", [f"/out/{i:03d}.png"], 100, mtime) for i in range(n)]
+
+
+def _drain(queue, worker_id):
+    """Claims and completes jobs until the queue is empty; returns their inputs."""
+    inputs = []
+    while True:
+        claim = queue.claim(worker_id)
+        if claim is None:
+            return inputs
+        inputs.append(claim.job["input"])
+        queue.complete(claim, DONE, 1.0, None, worker_id)
+
+
+class ShardQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.queue = ShardQueue(self.dir, lease_seconds=600, max_attempts=3)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _expire(self, claim):
+        """Backdates claim's lease past lease_seconds."""
+        old = self.queue.now() - 2 * self.queue.lease_seconds
+        os.utime(claim.path, (old, old))
+
+    def test_concurrent_workers_claim_each_job_once(self):
+        self.queue.enqueue(_jobs(200))
+        results = {}
+
+        def work(worker_id):
+            # One ShardQueue per worker, as on separate machines
+            results[worker_id] = _drain(ShardQueue(self.dir), worker_id)
+
+        workers = [threading.Thread(target=work, args=(w,)) for w in ("a", "b", "c", "d")]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        claimed = sorted(path for inputs in results.values() for path in inputs)
+        self.assertEqual(claimed, [path for path, _, _, _ in _jobs(200)])
+        self.assertEqual(self.queue.counts(), {"todo": 0, "claimed": 0, DONE: 200})
+
+    def test_enqueue_skips_known_inputs(self):
+        self.assertEqual(self.queue.enqueue(_jobs(3)), 3)
+        self.assertEqual(self.queue.enqueue(_jobs(3)), 0)  # Still queued
+        _drain(self.queue, "a")
+        self.assertEqual(self.queue.enqueue(_jobs(3)), 0)  # Done, unchanged
+        self.assertEqual(self.queue.enqueue(_jobs(3, mtime=2.0)), 3)  # Files changed since
+
+    def test_expired_lease_is_requeued(self):
+        self.queue.enqueue(_jobs(1))
+        claim = self.queue.claim("a")
+        self.assertEqual(self.queue.reclaim_expired(), 0)  # Lease still fresh
+
+        self._expire(claim)
+        self.assertEqual(self.queue.reclaim_expired(), 1)
+        self.queue.renew([claim])  # The lost lease is only logged
+        again = self.queue.claim("b")
+        self.assertEqual(again.job, claim.job)
+        self.assertTrue(again.path.endswith("~1.job@b"))
+
+    def test_renewed_lease_is_kept(self):
+        self.queue.enqueue(_jobs(1))
+        claim = self.queue.claim("a")
+        self._expire(claim)
+        self.queue.renew([claim])
+        self.assertEqual(self.queue.reclaim_expired(), 0)
+
+    def test_late_complete_drops_the_requeued_copy(self):
+        self.queue.enqueue(_jobs(2))
+        first = self.queue.claim("a")
+        self._expire(first)
+        self.queue.reclaim_expired()
+        # Worker a finishes after all, once its copy was re-queued
+        self.queue.complete(first, DONE, 1.0, None, "a")
+
+        processed = _drain(self.queue, "b")
+        self.assertEqual(len(processed), 1)
+        self.assertNotIn(first.job["input"], processed)
+        self.assertEqual(os.listdir(self.queue.todo_dir), [])
+        self.assertEqual(self.queue.counts(), {"todo": 0, "claimed": 0, DONE: 2})
+
+    def test_gives_up_after_max_attempts(self):
+        self.queue.enqueue(_jobs(1))
+        for attempt in range(self.queue.max_attempts):
+            claim = self.queue.claim(f"w{attempt}")
+            self.assertIsNotNone(claim)
+            self._expire(claim)
+            self.queue.reclaim_expired()
+
+        self.assertIsNone(self.queue.claim("late"))
+        [result] = list(self.queue.results())
+        self.assertEqual(result["status"], FAILED)
+        self.assertIn("lease expired 3 times", result["error"])
+
+        manifest_path = os.path.join(self.dir, "jobs.sqlite")
+        self.assertEqual(self.queue.merge(manifest_path), {FAILED: 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+core.shm.ShmRing: slots wrap around the end of the segment, space is only
+reclaimed from the tail once every older slot is freed, waiting allocations
+wake up on free() / close(), and live slots never overlap.
+
+    python -m pytest tests
+"""
+import random
+import threading
+import unittest
+
+import numpy as np
+
+from core.shm import ShmRing, array_view
+
+
+class ShmRingTest(unittest.TestCase):
+    def setUp(self):
+        self.ring = ShmRing(1024)
+
+    def tearDown(self):
+        self.ring.close()
+
+    def test_wraps_to_the_start(self):
+        a, b, c = (self.ring.alloc(256) for _ in range(3))
+        self.assertEqual([a.offset, b.offset, c.offset], [0, 256, 512])
+        self.ring.free(a)
+        self.assertEqual(self.ring.alloc(256).offset, 768)
+        # No room at the end any more, the freed tail at the start is reused
+        self.assertEqual(self.ring.alloc(256).offset, 0)
+        with self.assertRaises(TimeoutError):
+            self.ring.alloc(64, timeout=0.05)
+
+    def test_space_is_reclaimed_in_order(self):
+        slots = [self.ring.alloc(256) for _ in range(4)]
+        self.ring.free(slots[1])
+        # slots[0] still holds the tail, so slots[1]'s space is not usable yet
+        with self.assertRaises(TimeoutError):
+            self.ring.alloc(256, timeout=0.05)
+        self.assertEqual(self.ring.in_use(), 768)
+
+        self.ring.free(slots[0])
+        self.assertEqual(self.ring.alloc(512).offset, 0)
+
+    def test_alloc_waits_for_free(self):
+        slots = [self.ring.alloc(512) for _ in range(2)]
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(self.ring.alloc(512, timeout=5)))
+        waiter.start()
+        self.ring.free(slots[0])
+        waiter.join()
+        self.assertEqual(got[0].offset, 0)
+
+    def test_close_wakes_waiters(self):
+        self.ring.alloc(1024)
+        errors = []
+
+        def wait():
+            try:
+                self.ring.alloc(64, timeout=5)
+            except RuntimeError as e:
+                errors.append(e)
+
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        ring, self.ring = self.ring, ShmRing(64)  # tearDown closes the spare
+        ring.close()
+        waiter.join()
+        self.assertEqual(len(errors), 1)
+
+    def test_invalid_requests(self):
+        with self.assertRaises(ValueError):
+            self.ring.alloc(2048)
+        slot = self.ring.alloc(100)
+        self.ring.free(slot)
+        with self.assertRaises(ValueError):
+            self.ring.free(slot)
+
+    def test_live_slots_never_overlap(self):
+        rng = random.Random(1234)
+        live = []
+        for step in range(5000):
+            if live and (rng.random() < 0.5 or self.ring.in_use() > 768):
+                slot = live.pop(rng.randrange(len(live)))
+                view = array_view(self.ring.buf, slot.offset, (slot.nbytes,))
+                # Nobody else wrote into this slot meanwhile
+                self.assertTrue(np.all(view == slot.offset // 64 % 251))
+                del view
+                self.ring.free(slot)
+                continue
+            try:
+                slot = self.ring.alloc(rng.randrange(1, 300), timeout=0)
+            except TimeoutError:
+                continue
+            self.assertLessEqual(slot.offset + slot.nbytes, self.ring.capacity)
+            for other in live:
+                self.assertTrue(slot.offset + slot.nbytes <= other.offset
+                                or other.offset + other.nbytes <= slot.offset, (step, slot, other))
+            view = array_view(self.ring.buf, slot.offset, (slot.nbytes,))
+            view[:] = slot.offset // 64 % 251
+            del view
+            live.append(slot)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Cold-start import check for the desktop app.
+
+Imports the modules needed to show the main window in a fresh interpreter
+under 'python -X importtime', prints the slowest imports and fails when a
+heavy ML package is pulled in before the window shows, or when the total
+goes over budget.
+
+    python tools/check_import_time.py [--budget-ms 600] [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules needed to put the window on screen
+STARTUP_MODULES = ["PyQt6.QtWidgets", "gui.mainwindow"]
+
+# Must only be imported after the window is visible
+HEAVY_MODULES = ["rembg", "onnxruntime", "numba", "pymatting", "scipy", "skimage", "cv2"]
+
+
+def measure(modules):
+    """Returns ([(module, self_us, cumulative_us, depth)], error_text)."""
+    code = "; ".join(f"import {m}" for m in modules)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    rows = []
+    errors = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # Header line
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(parts[0]), int(parts[1]), depth))
+    return rows, "\n".join(errors) if proc.returncode else ""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=600.0,
+                        help="Maximum total import time for the startup modules")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    args = parser.parse_args(argv)
+
+    rows, error = measure(STARTUP_MODULES)
+    if error:
+        print(error)
+        print("FAIL: startup modules could not be imported")
+        return 2
+
+    total_ms = sum(cum for _, _, cum, depth in rows if depth == 0) / 1000.0
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cum_us, depth in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{cum_us / 1000.0:14.1f} {self_us / 1000.0:9.1f}  {name}")
+    print(f"\nTotal startup import time: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    loaded = {name for name, _, _, _ in rows}
+    heavy = [m for m in HEAVY_MODULES if m in loaded]
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print("FAIL: startup imports over budget")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
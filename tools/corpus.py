@@ -0,0 +1,301 @@
+"""
+Deterministic synthetic image corpus with known foreground masks.
+
+Real customer photos cannot be checked in, so benchmarks and accuracy checks
+run on generated images instead: shapes with soft edges (some with hair-like
+strands), on flat, gradient, noise, stripe or cluttered backgrounds, from
+thumbnails up to 50MP, encoded as JPEG, PNG and WebP. Every image comes with
+its true alpha as a PNG and an entry in manifest.json.
+
+The same seed gives the same pixels for the same NumPy / Pillow versions.
+Images are produced in row bands, so the 50MP case needs about 600MB, mostly
+the finished frame itself.
+
+    python tools/corpus.py OUT_DIR [--preset small|standard|full] [--seed 1234]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+DEFAULT_SEED = 1234
+BAND_ROWS = 128
+MANIFEST = "manifest.json"
+
+# name, width, height, format, shape, background, hair
+CASES = [
+    ("thumb", 160, 120, "PNG", "ellipse", "flat", False),
+    ("vga_hair", 640, 480, "JPEG", "blob", "gradient", True),
+    ("square_star", 1024, 1024, "WEBP", "star", "stripes", False),
+    ("hd_multi", 1920, 1080, "JPEG", "multi", "clutter", False),
+    ("product", 2048, 1536, "PNG", "rect", "noise", False),
+    ("photo_12mp_hair", 4000, 3000, "JPEG", "blob", "noise", True),
+    ("photo_24mp", 6000, 4000, "WEBP", "star", "gradient", False),
+    ("photo_50mp_hair", 8192, 6144, "JPEG", "ellipse", "clutter", True),
+]
+
+PRESETS = {
+    "small": CASES[:3],     # quick checks, < 1MP
+    "standard": CASES[:6],  # up to 12MP, what the perf gate uses
+    "full": CASES,          # up to 50MP
+}
+
+SAVE_OPTIONS = {"JPEG": {"quality": 92}, "PNG": {"compress_level": 1}, "WEBP": {"quality": 90}}
+
+
+def _polar_radius(shape, theta, params):
+    """Outline radius (as a fraction of the base radius) at angle theta."""
+    if shape == "blob":
+        r = np.ones_like(theta)
+        for k, amp, phase in params["harmonics"]:
+            r += amp * np.sin(k * theta + phase)
+        return r
+    if shape == "star":
+        k, inner = params["points"], params["inner"]
+        return inner + (1 - inner) * np.abs(np.cos(k * theta / 2)) ** 2
+    return np.ones_like(theta)
+
+
+def _shape_alpha(shape, params, yy, xx, edge):
+    """Soft coverage (0..1) of the shape at pixel centres yy, xx."""
+    if shape == "rect":
+        cx, cy, hw, hh, rad = params["rect"]
+        qx = np.abs(xx - cx) - (hw - rad)
+        qy = np.abs(yy - cy) - (hh - rad)
+        outside = np.hypot(np.maximum(qx, 0), np.maximum(qy, 0)) + np.minimum(np.maximum(qx, qy), 0)
+        dist = rad - outside
+    elif shape == "multi":
+        dist = None
+        for cx, cy, rx, ry in params["ellipses"]:
+            d = (1 - np.hypot((xx - cx) / rx, (yy - cy) / ry)) * min(rx, ry)
+            dist = d if dist is None else np.maximum(dist, d)
+    else:
+        cx, cy, radius = params["center"][0], params["center"][1], params["radius"]
+        dx, dy = xx - cx, yy - cy
+        if shape == "ellipse":
+            rx, ry = radius * params["aspect"], radius
+            dist = (1 - np.hypot(dx / rx, dy / ry)) * min(rx, ry)
+        else:
+            dist = radius * _polar_radius(shape, np.arctan2(dy, dx), params) - np.hypot(dx, dy)
+    return np.clip(dist / edge + 0.5, 0.0, 1.0)
+
+
+def _shape_params(shape, width, height, rng):
+    short = min(width, height)
+    center = (width * rng.uniform(0.4, 0.6), height * rng.uniform(0.45, 0.6))
+    params = {"center": center, "radius": short * rng.uniform(0.25, 0.33)}
+    if shape == "ellipse":
+        params["aspect"] = rng.uniform(0.7, 1.0)
+    elif shape == "blob":
+        params["harmonics"] = [(int(k), rng.uniform(0.03, 0.1), rng.uniform(0, 2 * math.pi))
+                               for k in rng.integers(2, 7, size=3)]
+    elif shape == "star":
+        params["points"] = int(rng.integers(5, 9))
+        params["inner"] = rng.uniform(0.45, 0.65)
+    elif shape == "rect":
+        hw, hh = width * rng.uniform(0.2, 0.3), height * rng.uniform(0.25, 0.35)
+        params["rect"] = (center[0], center[1], hw, hh, min(hw, hh) * rng.uniform(0.05, 0.3))
+    elif shape == "multi":
+        params["ellipses"] = [(width * rng.uniform(0.25, 0.75), height * rng.uniform(0.3, 0.7),
+                               short * rng.uniform(0.1, 0.2), short * rng.uniform(0.1, 0.2))
+                              for _ in range(3)]
+    return params
+
+
+def _hair_layer(shape, params, width, height, rng):
+    """'L' image of thin strands growing out of the top of the outline."""
+    layer = Image.new("L", (width, height), 0)
+    draw = ImageDraw.Draw(layer)
+    scale = min(width, height) / 1000
+    cx, cy = params["center"]
+    radius = params["radius"]
+    aspect = params.get("aspect", 1.0)
+    strand_width = max(1, round(1.5 * scale))
+    opacity = 170
+
+    for _ in range(int(300 * max(1.0, scale ** 0.5))):
+        theta = rng.uniform(-0.85 * math.pi, -0.15 * math.pi)
+        r = radius * float(_polar_radius(shape, np.array([theta]), params)[0])
+        x, y = cx + r * aspect * math.cos(theta), cy + r * math.sin(theta)
+        # Random walk outwards with a slowly turning direction
+        direction = theta + rng.normal(0, 0.3)
+        length = radius * rng.uniform(0.05, 0.25)
+        steps = 12
+        points = [(x, y)]
+        for _ in range(steps):
+            direction += rng.normal(0, 0.15)
+            x += math.cos(direction) * length / steps
+            y += math.sin(direction) * length / steps
+            points.append((x, y))
+        draw.line(points, fill=opacity, width=strand_width)
+    # Soften the strands a little, like a lens would
+    return layer.filter(ImageFilter.GaussianBlur(0.6 * max(1.0, scale)))
+
+
+def _smooth_field(rng, width, height, cells, channels=3):
+    """Low-frequency random field as per-channel 'F' images to crop bands from."""
+    grid_w = max(2, round(cells * width / max(width, height)))
+    grid_h = max(2, round(cells * height / max(width, height)))
+    grid = rng.uniform(0, 255, (grid_h, grid_w, channels)).astype(np.float32)
+    return [Image.fromarray(np.ascontiguousarray(grid[..., c])) for c in range(channels)]
+
+
+def _field_band(field, width, height, top, bottom):
+    grid_w, grid_h = field[0].size
+    box = (0, top * grid_h / height, grid_w, bottom * grid_h / height)
+    return np.stack([np.asarray(f.resize((width, bottom - top), Image.Resampling.BICUBIC, box=box))
+                     for f in field], axis=-1)
+
+
+def _background_params(kind, width, height, rng):
+    params = {"colors": rng.uniform(0, 255, (2, 3)).astype(np.float32)}
+    if kind == "gradient":
+        params["angle"] = rng.uniform(0, 2 * math.pi)
+    elif kind == "noise":
+        params["field"] = _smooth_field(rng, width, height, cells=8)
+    elif kind == "stripes":
+        params["period"] = max(3.0, min(width, height) / rng.uniform(40, 120))
+        params["angle"] = rng.uniform(0, math.pi)
+    elif kind == "clutter":
+        # Random rectangles / discs drawn small, then scaled up band by band
+        small = (max(2, width // 16), max(2, height // 16))
+        canvas = Image.new("RGB", small, tuple(int(c) for c in params["colors"][0]))
+        draw = ImageDraw.Draw(canvas)
+        for _ in range(40):
+            x0, y0 = rng.uniform(0, small[0]), rng.uniform(0, small[1])
+            w, h = rng.uniform(2, small[0] / 4), rng.uniform(2, small[1] / 4)
+            color = tuple(int(c) for c in rng.uniform(0, 255, 3))
+            if rng.uniform() < 0.5:
+                draw.rectangle((x0, y0, x0 + w, y0 + h), fill=color)
+            else:
+                draw.ellipse((x0, y0, x0 + w, y0 + h), fill=color)
+        arr = np.asarray(canvas, dtype=np.float32)
+        params["field"] = [Image.fromarray(np.ascontiguousarray(arr[..., c])) for c in range(3)]
+    return params
+
+
+def _background_band(kind, params, yy, xx, width, height, top, bottom):
+    c0, c1 = params["colors"]
+    if kind == "flat":
+        return np.broadcast_to(c0, yy.shape + (3,))
+    if kind in ("gradient", "stripes"):
+        angle = params["angle"]
+        proj = (xx * math.cos(angle) + yy * math.sin(angle))
+        if kind == "gradient":
+            # Normalise by the projections of the image corners
+            corners = [x * math.cos(angle) + y * math.sin(angle) for x in (0, width) for y in (0, height)]
+            lo, hi = min(corners), max(corners)
+            t = np.clip((proj - lo) / max(hi - lo, 1e-6), 0, 1)[..., None]
+        else:
+            t = (0.5 + 0.5 * np.sin(proj * 2 * math.pi / params["period"]))[..., None]
+        return c0 + (c1 - c0) * t
+    return _field_band(params["field"], width, height, top, bottom)
+
+
+def generate_image(case, seed=DEFAULT_SEED, index=0):
+    """(RGB image, 'L' true mask, metadata) for one corpus case."""
+    name, width, height, fmt, shape, background, hair = case
+    rng = np.random.default_rng([seed, index])
+
+    shape_params = _shape_params(shape, width, height, rng)
+    bg_params = _background_params(background, width, height, rng)
+    hair_layer = _hair_layer(shape, shape_params, width, height, rng) if hair else None
+    fg_color = rng.uniform(0, 255, 3).astype(np.float32)
+    hair_color = fg_color * 0.4
+    edge = max(1.0, min(width, height) / 1000)
+    light = rng.uniform(0, 2 * math.pi)
+
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    mask = np.empty((height, width), dtype=np.uint8)
+    for band, top in enumerate(range(0, height, BAND_ROWS)):
+        bottom = min(height, top + BAND_ROWS)
+        yy, xx = np.mgrid[top:bottom, 0:width].astype(np.float32)
+        yy += 0.5
+        xx += 0.5
+
+        alpha = _shape_alpha(shape, shape_params, yy, xx, edge)
+        # Simple shading so the foreground is not flat
+        shade = 0.8 + 0.2 * np.cos((xx / width) * math.cos(light) * 4 + (yy / height) * math.sin(light) * 4)
+        fg = fg_color * shade[..., None]
+        if hair_layer is not None:
+            strands = np.asarray(hair_layer.crop((0, top, width, bottom)), dtype=np.float32) / 255.0
+            hair_alpha = strands * (1 - alpha)
+            fg = (fg * alpha[..., None] + hair_color * hair_alpha[..., None]) / \
+                np.maximum(alpha + hair_alpha, 1e-6)[..., None]
+            alpha = alpha + hair_alpha
+
+        bg = _background_band(background, bg_params, yy, xx, width, height, top, bottom)
+        noise = np.random.default_rng([seed, index, band]).normal(0, 3, bg.shape[:2] + (3,))
+        out = alpha[..., None] * fg + (1 - alpha[..., None]) * bg + noise
+        pixels[top:bottom] = np.clip(out + 0.5, 0, 255)
+        mask[top:bottom] = np.clip(alpha * 255 + 0.5, 0, 255)
+
+    meta = {"name": name, "width": width, "height": height, "format": fmt, "shape": shape,
+            "background": background, "hair": hair, "seed": seed, "index": index}
+    return Image.fromarray(pixels), Image.fromarray(mask), meta
+
+
+def generate(directory, preset="standard", seed=DEFAULT_SEED, cases=None):
+    """Writes the images, masks and manifest.json; returns the manifest entries."""
+    os.makedirs(directory, exist_ok=True)
+    entries = []
+    for index, case in enumerate(cases or PRESETS[preset]):
+        image, mask, meta = generate_image(case, seed, index)
+        fmt = meta["format"]
+        image_name = f"{meta['name']}.{'jpg' if fmt == 'JPEG' else fmt.lower()}"
+        mask_name = f"{meta['name']}_mask.png"
+        image.save(os.path.join(directory, image_name), fmt, **SAVE_OPTIONS[fmt])
+        mask.save(os.path.join(directory, mask_name), compress_level=1)
+        entries.append(dict(meta, image=image_name, mask=mask_name))
+
+    with open(os.path.join(directory, MANIFEST), "w") as f:
+        json.dump({"seed": seed, "preset": preset, "images": entries}, f, indent=2)
+    return entries
+
+
+def load_corpus(directory):
+    """Manifest entries with absolute image / mask paths."""
+    with open(os.path.join(directory, MANIFEST)) as f:
+        entries = json.load(f)["images"]
+    for entry in entries:
+        entry["image"] = os.path.join(directory, entry["image"])
+        entry["mask"] = os.path.join(directory, entry["mask"])
+    return entries
+
+
+def _as_unit(mask):
+    arr = np.asarray(mask.getchannel("A") if getattr(mask, "mode", None) == "RGBA" else mask)
+    return arr.astype(np.float32) / 255.0 if arr.dtype == np.uint8 else arr.astype(np.float32)
+
+
+def iou(pred, truth, threshold=0.5):
+    """Intersection over union of the binarised masks (arrays, 'L' or RGBA images)."""
+    p, t = _as_unit(pred) >= threshold, _as_unit(truth) >= threshold
+    union = np.count_nonzero(p | t)
+    return np.count_nonzero(p & t) / union if union else 1.0
+
+
+def mae(pred, truth):
+    """Mean absolute alpha error, 0..1."""
+    return float(np.abs(_as_unit(pred) - _as_unit(truth)).mean())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("output", help="Folder to write the corpus to")
+    parser.add_argument("--preset", choices=PRESETS, default="standard",
+                        help="small: < 1MP, standard: up to 12MP, full: up to 50MP")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args(argv)
+
+    for entry in generate(args.output, args.preset, args.seed):
+        print(f"{entry['width']:>5}x{entry['height']:<5} {entry['format']:<5} {entry['image']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+"""
+Performance regression gate for the removal path.
+
+Runs the shared pipeline stages (decode, preprocess, inference, mask
+upsampling, band matting, compositing, encoding) over a fixed synthetic
+corpus, and with --model also the end-to-end removal of each front end
+(BgRemover.process_image, MobileRemover.process_image). Then it compares
+latency and peak RSS with a stored baseline and fails when either
+regresses past its threshold. A per-stage table shows where the time went.
+
+Latency is the median over the repeats of each image, summed over the
+corpus, so one slow pass or one large image cannot dominate. The spread of
+the repeats gives each figure a noise estimate, and a change only counts as
+a regression when it also exceeds NOISE_SIGMAS times the combined noise of
+both runs.
+
+Fully offline: the corpus comes from tools/corpus.py with a fixed seed. Inference and the
+end-to-end stages run only when --model points to an .onnx file; otherwise they are
+skipped and the later stages work from the corpus' true mask at model resolution.
+
+    python tools/perf_gate.py [--model ~/.u2net/u2net.onnx] [--baseline tools/perf_baseline.json]
+    python tools/perf_gate.py --update-baseline     # record this machine's numbers
+
+Baselines are machine specific; record them on the box that runs the gate.
+Without a baseline the gate fails. The committed tools/perf_baseline.json
+was recorded without --model on a 1-CPU x86_64 Linux box (see its "machine"
+field); re-record it for the machine that runs the gate.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(ROOT, "tools", "perf_baseline.json")
+# Bumped when the result format or what it measures changes; older baselines must be re-recorded
+BASELINE_VERSION = 3
+
+STAGES = ["decode", "preprocess", "inference", "upsample", "matting", "composite", "encode"]
+# Whole removals through each front end, decode included (need --model)
+END_TO_END = ["bgremover", "mobile"]
+
+# tools/corpus.py preset the gate runs on (thumbnail to 12MP)
+CORPUS_PRESET = "standard"
+
+# A latency change must exceed this many standard errors of the two runs combined
+NOISE_SIGMAS = 3.0
+
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _record(timings, stage, name, ms):
+    timings.setdefault(stage, {}).setdefault(name, []).append(ms)
+
+
+def run_stages(entries, model_path, spec_name, threads, repeat, warmup):
+    """Times every stage on every image; returns the raw timings in ms per stage and image."""
+    import numpy as np
+    from PIL import Image
+
+    from core.composite import Compositor
+    from core.encoder import save_image
+    from core.guided import guided_upsample
+    from core.matting import refine_band
+    from core.models import get_spec
+    from core.preprocess import Preprocessor
+
+    spec = get_spec(spec_name)
+    engine = None
+    if model_path:
+        from core.engine import Engine
+        engine = Engine(spec, model_path, threads=threads)
+        preprocess, size = engine.preprocess, engine.input_size
+    else:
+        size = spec.input_size
+        preprocess = Preprocessor((size, size), spec.mean, spec.std, resample=Image.Resampling.LANCZOS,
+                                  normalize_max=True, reducing_gap=3.0)
+
+    timings = {}
+    out_dir = tempfile.mkdtemp(prefix="perf_gate_")
+    for run in range(warmup + repeat):
+        for entry in entries:
+            path = entry["image"]
+            times = {}
+
+            start = time.perf_counter()
+            img = Image.open(path)
+            img.load()
+            img = img.convert("RGB")
+            times["decode"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            tensor = preprocess(img)
+            times["preprocess"] = time.perf_counter() - start
+
+            if engine is not None:
+                start = time.perf_counter()
+                pred = engine.infer(tensor)[0, 0]
+                times["inference"] = time.perf_counter() - start
+            else:
+                # Stand-in prediction: the true mask at model resolution
+                with Image.open(entry["mask"]) as true_mask:
+                    pred = np.asarray(true_mask.resize((size, size), Image.Resampling.BILINEAR),
+                                      dtype=np.float32) / 255.0
+
+            start = time.perf_counter()
+            mask = guided_upsample(pred, img)
+            times["upsample"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            cutout = refine_band(img, mask)
+            times["matting"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            Compositor(cutout).composite("white")
+            times["composite"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            save_image(cutout, os.path.join(out_dir, "out.png"), preset="fast")
+            times["encode"] = time.perf_counter() - start
+
+            if run >= warmup:
+                for stage, seconds in times.items():
+                    _record(timings, stage, entry["name"], seconds * 1000)
+                _record(timings, "total", entry["name"], sum(times.values()) * 1000)
+
+    return {"timings": timings, "inference": engine is not None}
+
+
+def _open_removers(model_path, spec_name, threads, work_dir):
+    """(stage, callable(path)) for the desktop and the mobile remover, both on model_path."""
+    from PIL import Image
+
+    from core.models import get_spec
+
+    spec = get_spec(spec_name)
+    removers = []
+
+    # The desktop remover finds registry models by file name in U2NET_HOME
+    os.environ["U2NET_HOME"] = work_dir
+    try:
+        os.symlink(os.path.abspath(model_path), os.path.join(work_dir, spec.filename))
+    except OSError:
+        import shutil
+        shutil.copyfile(model_path, os.path.join(work_dir, spec.filename))
+    from core.remover import BgRemover
+    desktop = BgRemover(spec.name, threads=threads)
+
+    def desktop_remove(path):
+        with Image.open(path) as img:
+            return desktop.process_image(img, alpha_matting=True, matting_mode="band", post_process=False)
+    removers.append(("bgremover", desktop_remove))
+
+    sys.path.insert(0, os.path.join(ROOT, "Mobile app"))
+    from remover_mobile import MobileRemover
+    # Caches go to work_dir; an absolute model_path is used where it is
+    mobile = MobileRemover(spec, model_dir=work_dir, threads=threads, model_path=os.path.abspath(model_path))
+    removers.append(("mobile", lambda path: mobile.process_image(path, refine_edges=True)))
+    return removers
+
+
+def run_end_to_end(entries, model_path, spec_name, threads, repeat, warmup):
+    """Times whole removals through each front end; returns ms per stage and image."""
+    timings = {}
+    with tempfile.TemporaryDirectory(prefix="perf_models_") as work_dir:
+        for stage, remove in _open_removers(model_path, spec_name, threads, work_dir):
+            for run in range(warmup + repeat):
+                for entry in entries:
+                    start = time.perf_counter()
+                    remove(entry["image"])
+                    if run >= warmup:
+                        _record(timings, stage, entry["name"], (time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _stats(per_image):
+    """
+    Sum over the images of the median of their repeats, with its standard
+    error estimated from the median absolute deviation of the repeats.
+    """
+    total, variance, images = 0.0, 0.0, {}
+    for name, values in per_image.items():
+        median = statistics.median(values)
+        mad = statistics.median(abs(v - median) for v in values)
+        # MAD -> standard deviation -> standard error of a median of n samples
+        error = 1.2533 * 1.4826 * mad / math.sqrt(len(values))
+        total += median
+        variance += error * error
+        images[name] = round(median, 2)
+    return {"median_ms": round(total, 2), "noise_ms": round(math.sqrt(variance), 2), "images": images}
+
+
+def summarize(raw, peak_mb, repeat):
+    stages = {stage: _stats(raw["timings"][stage])
+              for stage in STAGES + END_TO_END if raw["timings"].get(stage)}
+    return {
+        "version": BASELINE_VERSION,
+        "machine": {"platform": platform.platform(), "processor": platform.machine(),
+                    "python": platform.python_version(), "cpus": os.cpu_count()},
+        "inference": raw["inference"],
+        "repeat": repeat,
+        "stages": stages,
+        "total": _stats(raw["timings"]["total"]),
+        "peak_rss_mb": round(peak_mb, 1),
+    }
+
+
+def measure(args):
+    """
+    Runs the benchmark in a fresh interpreter so peak RSS covers only the run.
+    The corpus is generated here first: synthesising the 12MP images takes
+    more memory than processing them and would set the worker's peak.
+    """
+    import corpus
+
+    with tempfile.TemporaryDirectory(prefix="perf_corpus_") as corpus_dir:
+        corpus.generate(corpus_dir, CORPUS_PRESET)
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", "--corpus", corpus_dir,
+               "--repeat", str(args.repeat), "--warmup", str(args.warmup),
+               "--threads", str(args.threads), "--spec", args.spec]
+        if args.model:
+            cmd += ["--model", args.model]
+        proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode:
+        print(proc.stderr)
+        raise SystemExit("FAIL: benchmark run crashed")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def worker(args):
+    import corpus
+
+    entries = corpus.load_corpus(args.corpus)
+    raw = run_stages(entries, args.model, args.spec, args.threads, args.repeat, args.warmup)
+    if args.model:
+        raw["timings"].update(run_end_to_end(entries, args.model, args.spec, args.threads,
+                                             args.repeat, args.warmup))
+    print(json.dumps(summarize(raw, peak_rss_mb(), args.repeat)))
+    return 0
+
+
+def _change(new, old):
+    return (new - old) / old if old else 0.0
+
+
+def _regressed(new, old, max_latency, min_delta_ms):
+    """Whether new is slower than old by more than the threshold, the noise floor and the noise."""
+    delta = new["median_ms"] - old["median_ms"]
+    noise = NOISE_SIGMAS * math.hypot(new["noise_ms"], old["noise_ms"])
+    return _change(new["median_ms"], old["median_ms"]) > max_latency and delta > max(min_delta_ms, noise)
+
+
+def _row(name, new, old, max_latency, min_delta_ms):
+    change = _change(new["median_ms"], old["median_ms"])
+    noise = math.hypot(new["noise_ms"], old["noise_ms"])
+    flag = "  <--" if _regressed(new, old, max_latency, min_delta_ms) else ""
+    print(f"{name:<12} {old['median_ms']:>10.1f} {new['median_ms']:>10.1f} {change:>+8.1%} "
+          f"{noise:>8.1f}{flag}")
+
+
+def compare(result, baseline, max_latency, max_rss, min_delta_ms):
+    """Prints the per-stage diff; returns a list of failure messages."""
+    failures = []
+    if baseline.get("version") != BASELINE_VERSION:
+        return ["baseline was recorded by an older perf_gate; record it again with --update-baseline"]
+    if result["inference"] != baseline["inference"]:
+        failures.append("baseline was recorded " + ("with" if baseline["inference"] else "without")
+                        + " inference; run with the same --model setting")
+
+    print(f"{'stage':<12} {'base ms':>10} {'ms':>10} {'change':>8} {'noise':>8}")
+    for stage in STAGES + END_TO_END:
+        new = result["stages"].get(stage)
+        old = baseline["stages"].get(stage)
+        if new is None and old is None:
+            continue
+        if new is None or old is None:
+            print(f"{stage:<12} {'-' if old is None else old['median_ms']:>10} "
+                  f"{'-' if new is None else new['median_ms']:>10}   (skipped in one run)")
+            if new is None and stage in END_TO_END:
+                failures.append(f"{stage} is in the baseline but did not run")
+            continue
+        _row(stage, new, old, max_latency, min_delta_ms)
+        if stage in END_TO_END and _regressed(new, old, max_latency, min_delta_ms):
+            failures.append(f"{stage} end-to-end latency regressed "
+                            f"{_change(new['median_ms'], old['median_ms']):+.1%} (limit {max_latency:.0%})")
+
+    new, old = result["total"], baseline["total"]
+    _row("total", new, old, max_latency, min_delta_ms)
+    if _regressed(new, old, max_latency, min_delta_ms):
+        failures.append(f"pipeline latency regressed {_change(new['median_ms'], old['median_ms']):+.1%} "
+                        f"(limit {max_latency:.0%})")
+    # The images behind a total regression, worst first
+    slower = sorted(((_change(ms, old["images"][name]), name) for name, ms in new["images"].items()
+                     if name in old["images"]), reverse=True)
+    if slower and slower[0][0] > max_latency:
+        print("slowest images: " + ", ".join(f"{name} {change:+.0%}" for change, name in slower[:3]))
+
+    rss_change = _change(result["peak_rss_mb"], baseline["peak_rss_mb"])
+    print(f"{'peak RSS MB':<12} {baseline['peak_rss_mb']:>10.1f} {result['peak_rss_mb']:>10.1f} {rss_change:>+8.1%}")
+    if rss_change > max_rss:
+        failures.append(f"peak RSS regressed {rss_change:+.1%} (limit {max_rss:.0%})")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", help="ONNX model to include inference and end-to-end removal "
+                                        "(skipped when absent)")
+    parser.add_argument("--spec", default="u2net",
+                        help="core.models entry the model belongs to (input size, normalisation)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="Record this run as the baseline")
+    parser.add_argument("--repeat", type=int, default=5, help="Measured passes over the corpus")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured passes first")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Inference threads (fixed for comparable numbers)")
+    parser.add_argument("--max-latency-regression", type=float, default=0.15,
+                        help="Allowed latency increase, as a fraction")
+    parser.add_argument("--max-rss-regression", type=float, default=0.10,
+                        help="Allowed peak RSS increase, as a fraction")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0,
+                        help="Ignore latency changes smaller than this (timer noise)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--corpus", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.model and not os.path.exists(args.model):
+        print(f"Model {args.model} not found, skipping inference")
+        args.model = None
+    if args.worker:
+        return worker(args)
+
+    if not args.update_baseline and not os.path.exists(args.baseline):
+        # Checked first: a gate without a baseline would pass anything
+        print(f"FAIL: no baseline at {args.baseline}; record one with --update-baseline")
+        return 1
+
+    result = measure(args)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("machine") != result["machine"]:
+        print("Warning: baseline was recorded on a different machine / Python")
+    if baseline.get("repeat") != result["repeat"]:
+        print("Warning: baseline was recorded with a different --repeat")
+
+    failures = compare(result, baseline, args.max_latency_regression, args.max_rss_regression,
+                       args.min_delta_ms)
+    for message in failures:
+        print(f"FAIL: {message}")
+    if not failures:
+        print("OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())